@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import multiprocessing
+from collections import deque
+import numpy as np
+from tracker import MATCH_DISTANCE
+
+REPORT_INTERVAL = 0.2  # s between an idle arm's detection reports
+METRICS_INTERVAL = 5.0  # s between metrics lines from the CLI
+# s a picked part's position stays claimed, so another camera whose tracker
+# hasn't dropped it yet (up to MAX_MISSED frames) doesn't send its arm there
+PICKED_HOLD = 2.0
+CYCLE_WINDOW = 100  # newest cycle times kept per arm for the recent mean
+
+# Per-arm config keys (one dict per arm, e.g. from a JSON file {"arms": [...]}):
+#   name         unique name
+#   port / sim   firmware serial port, or true to run a SimulatedArm in the arm's process
+#   binary       binary frames instead of ASCII (default false)
+#   camera       camera index or a recorded video path (default 0)
+#   calibration  vision calibration file (default vision_calibration_<name>.npz)
+#   seed_index   IK seed index path (default: the one seedindex.py builds)
+#   base         [x, y] (mm) of the arm's workspace origin in the shared cell frame,
+#                used to recognise one part seen by two cameras (default [0, 0])
+
+def calibration_path(config):
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"vision_calibration_{config['name']}.npz")
+    return config.get('calibration', default)
+
+def run_arm(config, commands, events, report_interval=REPORT_INTERVAL):
+    # Entry point of one arm's process: serial link, camera, vision and IK all
+    # live here. Sends ('calibrated', name, ok), ('detections', name, [(track id,
+    # (x, y))...]) while idle, ('picked', name, track id, report or None) and
+    # ('error', name, message); takes ('pick', track id) and ('stop',).
+    from armcore import ArmCore
+    from reachmap import UnreachableTarget
+    name = config['name']
+    sim = None
+    core = None
+    try:
+        if config.get('sim'):
+            from simarm import SimulatedArm
+            sim = SimulatedArm()
+        port = sim.port_name if sim is not None else config['port']
+        core = ArmCore.open(port, binary=config.get('binary', False), seed_index_path=config.get('seed_index'))
+        core.start_vision(config.get('camera', 0), calibration_path(config))
+        events.put(('calibrated', name, core.wait_for_vision()))
+        tracker = core.vision_pipeline.tracker
+
+        while True:
+            try:
+                command = commands.get(timeout=report_interval)
+            except queue.Empty:
+                queued = [(track.id, tuple(float(value) for value in track.position)) for track in tracker.pick_queue()]
+                events.put(('detections', name, queued))
+                continue
+            if command[0] == 'stop':
+                break
+            track = tracker.claim(command[1])
+            if track is None:
+                events.put(('picked', name, command[1], None))
+                continue
+            tracker.paused = True
+            try:
+                report = core.pick(track.position)
+            except UnreachableTarget as e:
+                # Reported as refused; the tracker forgets the part below
+                print(f"Arm {name} skipping part: {e}")
+                report = None
+            finally:
+                tracker.remove(track.id)
+                tracker.paused = False
+            events.put(('picked', name, track.id, report))
+    except Exception as e:
+        events.put(('error', name, f"{type(e).__name__}: {e}"))
+    finally:
+        if core is not None:
+            core.close()
+        if sim is not None:
+            sim.close()
+
+class CellScheduler:
+    # Assigns detected parts to arms; no processes, so it can be driven directly.
+    # Each arm reports the pick queue of its own camera in its own frame. An idle,
+    # calibrated arm gets the oldest part it can see, unless that part (in cell
+    # coordinates, base + position) is within match_distance of one another arm
+    # is already picking or picked within the last picked_hold seconds. Idle arms
+    # are offered work in rotation, so a part two cameras see goes to whichever
+    # arm's turn comes first.
+    def __init__(self, bases, match_distance=MATCH_DISTANCE, picked_hold=PICKED_HOLD):
+        self.bases = {name: np.asarray(base, dtype=float) for name, base in bases.items()}
+        self.match_distance = match_distance
+        self.picked_hold = picked_hold
+        self.recently_picked = deque()  # (cell position, picked at)
+        self.rotation = deque(self.bases)
+        self.ready = set()
+        self.failed = {}  # arm -> error message
+        self.visible = {name: [] for name in self.bases}  # latest [(track id, (x, y))]
+        self.active = {}  # arm -> (track id, cell position, assigned at)
+        self.stats = {name: {'picks': 0, 'failed': 0, 'refused': 0, 'busy_time': 0.0, 'cycle_time': 0.0,
+                             'recent_cycles': deque(maxlen=CYCLE_WINDOW), 'timed_out': 0}
+                      for name in self.bases}
+        self.start_time = time.monotonic()
+
+    def cell_position(self, arm, position):
+        return self.bases[arm] + np.asarray(position, dtype=float)
+
+    def set_ready(self, arm, ready):
+        if ready:
+            self.ready.add(arm)
+        else:
+            self.failed[arm] = "vision did not calibrate"
+
+    def set_failed(self, arm, message):
+        self.failed[arm] = message
+        self.ready.discard(arm)
+        self.active.pop(arm, None)
+
+    def update(self, arm, detections):
+        self.visible[arm] = list(detections)
+
+    def assign(self, now=None):
+        # Returns [(arm, track id, position in the arm's frame)] to send out
+        now = time.monotonic() if now is None else now
+        while self.recently_picked and now - self.recently_picked[0][1] > self.picked_hold:
+            self.recently_picked.popleft()
+        assignments = []
+        for _ in range(len(self.rotation)):
+            arm = self.rotation[0]
+            self.rotation.rotate(-1)
+            if arm not in self.ready or arm in self.active:
+                continue
+            claimed = self.claimed_positions()
+            for track_id, position in self.visible[arm]:
+                cell = self.cell_position(arm, position)
+                if all(np.linalg.norm(cell - other) > self.match_distance for other in claimed):
+                    self.active[arm] = (track_id, cell, now)
+                    assignments.append((arm, track_id, position))
+                    break
+        return assignments
+
+    def claimed_positions(self):
+        return [cell for _, cell, _ in self.active.values()] + [cell for cell, _ in self.recently_picked]
+
+    def complete(self, arm, track_id, report, now=None):
+        # report is the pick-cycle report, or None if the arm refused the part or
+        # no longer had the track. Time from assignment counts as busy either way.
+        now = time.monotonic() if now is None else now
+        entry = self.active.pop(arm, None)
+        self.visible[arm] = [(other, position) for other, position in self.visible[arm] if other != track_id]
+        stats = self.stats[arm]
+        if entry is not None:
+            stats['busy_time'] += now - entry[2]
+        if report is None:
+            stats['refused'] += 1
+            return
+        stats['timed_out'] += len(report['timed_out'])
+        if report.get('failed'):
+            # The part may still be there; don't hold its position
+            stats['failed'] += 1
+            return
+        stats['picks'] += 1
+        stats['cycle_time'] += report['total']
+        stats['recent_cycles'].append(report['total'])
+        if entry is not None:
+            self.recently_picked.append((entry[1], now))
+
+    def pending_parts(self):
+        # Distinct parts seen but not being picked, across all cameras
+        parts = self.claimed_positions()
+        pending = 0
+        for arm, detections in self.visible.items():
+            for _, position in detections:
+                cell = self.cell_position(arm, position)
+                if all(np.linalg.norm(cell - other) > self.match_distance for other in parts):
+                    parts.append(cell)
+                    pending += 1
+        return pending
+
+    def total_picks(self):
+        return sum(stats['picks'] for stats in self.stats.values())
+
+    def metrics(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = max(now - self.start_time, 1e-9)
+        arms = {}
+        for name, stats in self.stats.items():
+            recent_cycles = stats['recent_cycles']
+            arms[name] = {
+                'state': 'failed' if name in self.failed else 'picking' if name in self.active
+                         else 'idle' if name in self.ready else 'starting',
+                'picks': stats['picks'],
+                'failed': stats['failed'],
+                'refused': stats['refused'],
+                'picks_per_minute': 60.0 * stats['picks'] / elapsed,
+                'mean_cycle_s': stats['cycle_time'] / stats['picks'] if stats['picks'] else None,
+                'recent_cycle_s': float(np.mean(recent_cycles)) if recent_cycles else None,
+                'utilization': stats['busy_time'] / elapsed,
+                'timed_out_phases': stats['timed_out'],
+            }
+            if name in self.failed:
+                arms[name]['error'] = self.failed[name]
+        return {
+            'elapsed_s': elapsed,
+            'picks': self.total_picks(),
+            'picks_per_minute': 60.0 * self.total_picks() / elapsed,
+            'pending_parts': self.pending_parts(),
+            'arms': arms,
+        }
+
+class ArmCell:
+    # Supervisor for several arms, each in its own process (run_arm) with its own
+    # serial link, camera, calibration and IK. Events from every arm come in on
+    # one queue; the CellScheduler turns them into pick commands.
+    def __init__(self, configs, match_distance=MATCH_DISTANCE):
+        names = [config['name'] for config in configs]
+        if len(set(names)) != len(names):
+            raise ValueError("arm names must be unique")
+        context = multiprocessing.get_context('spawn')
+        self.scheduler = CellScheduler({config['name']: config.get('base', (0, 0)) for config in configs},
+                                       match_distance)
+        self.events = context.Queue()
+        self.commands = {config['name']: context.Queue() for config in configs}
+        self.processes = {config['name']: context.Process(target=run_arm, name=f"arm-{config['name']}",
+                                                          args=(config, self.commands[config['name']], self.events),
+                                                          daemon=True)
+                          for config in configs}
+
+    def start(self):
+        for process in self.processes.values():
+            process.start()
+
+    def handle_event(self, event):
+        kind, arm = event[:2]
+        if kind == 'calibrated':
+            self.scheduler.set_ready(arm, event[2])
+        elif kind == 'detections':
+            self.scheduler.update(arm, event[2])
+        elif kind == 'picked':
+            self.scheduler.complete(arm, event[2], event[3])
+        elif kind == 'error':
+            print(f"Arm {arm} failed: {event[2]}")
+            self.scheduler.set_failed(arm, event[2])
+
+    def run(self, duration=None, max_picks=None, on_metrics=None, metrics_interval=METRICS_INTERVAL):
+        # Until duration (s) passes, max_picks parts are picked or every arm has
+        # failed. Returns the final metrics.
+        start = time.monotonic()
+        last_metrics = start
+        while True:
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            if max_picks is not None and self.scheduler.total_picks() >= max_picks:
+                break
+            if len(self.scheduler.failed) == len(self.processes):
+                break
+            try:
+                self.handle_event(self.events.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            for arm, track_id, _ in self.scheduler.assign():
+                self.commands[arm].put(('pick', track_id))
+            if on_metrics is not None and time.monotonic() - last_metrics >= metrics_interval:
+                last_metrics = time.monotonic()
+                on_metrics(self.scheduler.metrics())
+        return self.scheduler.metrics()
+
+    def stop(self, timeout=10.0):
+        # Arms finish the pick in progress before they stop
+        for commands in self.commands.values():
+            commands.put(('stop',))
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several arms from one host, sharing the detected parts.")
+    parser.add_argument("config", help='JSON file: {"arms": [{"name": ..., "port" or "sim": ..., "camera": ...}, ...]}')
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--max-picks", type=int, help="stop after this many picks across the cell")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        configs = json.load(f)['arms']
+    cell = ArmCell(configs)
+    cell.start()
+    try:
+        metrics = cell.run(args.duration, args.max_picks, on_metrics=lambda metrics: print(json.dumps(metrics)),
+                           metrics_interval=args.metrics_interval)
+    except KeyboardInterrupt:
+        metrics = cell.scheduler.metrics()
+    finally:
+        cell.stop()
+    json.dump(metrics, sys.stdout, indent=2)
+    print()
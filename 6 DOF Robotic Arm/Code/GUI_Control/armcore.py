@@ -0,0 +1,432 @@
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import numpy as np
+from motiontime import synchronized_profile, TIMING_MARGIN, TIMING_PADDING
+from armlink import format_move_command, COMPLETION_LINES
+from pickplace import PickAndPlace, PICK_HEIGHT
+
+# Only numpy and the pure-Python modules above load at import. The rest load
+# with the feature that needs them: kinematics on the first move (scipy only if
+# the optimizer fallback runs), pyserial when a port is opened, OpenCV with vision.
+
+# Fallback timeouts (s) for operations that normally end on a completion event
+COMPLETION_TIMEOUTS = {
+    'homing': 60,
+    'shutdown': 30,
+    'reset': 30,
+    'vision': 20,
+    'gripper_closed': 2,
+    'gripper_opened': 2,
+}
+PICK_TIMEOUT = 60.0  # s before pick() gives up waiting for a cycle's report
+
+# Measured effector Z (mm) against X (mm); a quadratic fit through these
+# compensates the sag for downward-tool moves
+Z_CALIBRATION_POINTS = np.array([
+    [100, 33],
+    [150, 36],
+    [200, 41],
+    [250, 45],
+    [300, 51],
+    [350, 57]
+])
+Z_OFFSET = np.polyfit(Z_CALIBRATION_POINTS[:, 0], Z_CALIBRATION_POINTS[:, 1], 2)
+
+def compensate_z(x, z, coeffs=Z_OFFSET):
+    z_compensation = np.polyval(coeffs, x)
+    return z + z_compensation - coeffs[2]
+
+def plan_move(start_angles, target_angles):
+    # Both in firmware degrees. Returns the synchronized (speeds, accels) profile
+    # for the M command and the scheduled movement time; see motiontime.
+    speeds, accels, move_time = synchronized_profile(np.subtract(target_angles, start_angles))
+    return (speeds, accels), float(move_time) * TIMING_MARGIN + TIMING_PADDING
+
+def load_seed_index(path=None):
+    # Built offline with `python seedindex.py`; IK still works without it
+    from seedindex import SeedIndex, DEFAULT_PATH
+    try:
+        return SeedIndex.load(path or DEFAULT_PATH)
+    except FileNotFoundError:
+        return None
+
+class DispatchClock:
+    # PickAndPlace clock whose timers fire on the core's dispatch thread
+    def __init__(self, core):
+        self.core = core
+
+    def now(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        timer = threading.Timer(delay, self.core.call_soon, (callback,))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def cancel(self, handle):
+        handle.cancel()
+
+class ArmCore:
+    # The arm without the GUI: IK, synchronized timed moves, firmware commands
+    # with completion events, pick-and-place cycles and, optionally, camera vision.
+    # Public methods block until the operation completes (or its fallback timeout
+    # passes) and can be called from any thread; moves are serialized. Firmware
+    # lines and pick-cycle timers are handled on one dispatch thread, the way the
+    # GUI handles them on its own thread, so PickAndPlace never runs concurrently
+    # and the serial reader is never held up. Without a link, commands go nowhere
+    # and every wait ends immediately (a dry run).
+    def __init__(self, link=None, seed_index=None, reach_map=None):
+        self.link = link
+        self.seed_index = seed_index
+        self.reach_map = reach_map  # a ReachabilityMap rejects unreachable downward targets before IK
+        self.previous_theta = np.zeros(6)
+        self.motion_lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.event_counts = {}  # completion event -> times seen
+        self.pick_reports = deque(maxlen=100)  # newest cycle reports, failed ones included
+        self.pick_lock = threading.Lock()  # one pick cycle at a time
+        self.pick_waiter = None  # Future of the pick() in progress
+        self.dispatch_queue = queue.Queue()
+        self.dispatcher = threading.Thread(target=self.run_dispatcher, daemon=True)
+        self.dispatcher.start()
+        self.pick_place = PickAndPlace(self.pick_move, self.send_command, DispatchClock(self),
+                                       on_cycle_complete=self.on_pick_complete)
+        self.vision_pipeline = None
+        self.vision_thread = None
+        self.grabber = None
+        if link is not None:
+            link.add_listener(lambda line: self.call_soon(self.on_firmware_line, line))
+
+    @classmethod
+    def open(cls, port, baudrate=115200, binary=False, seed_index_path=None, reach_map_path=None):
+        from armlink import SerialLink
+        from frameproto import BinaryCodec
+        from reachmap import load_reach_map, DEFAULT_PATH
+        link = SerialLink.open(port, baudrate, codec=BinaryCodec() if binary else None)
+        return cls(link, load_seed_index(seed_index_path), load_reach_map(reach_map_path or DEFAULT_PATH))
+
+    def call_soon(self, callback, *args):
+        self.dispatch_queue.put((callback, args))
+
+    def run_dispatcher(self):
+        while True:
+            callback, args = self.dispatch_queue.get()
+            if callback is None:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                # Keep dispatching; a pick cycle that hit the error ends as failed
+                print(f"Error in {getattr(callback, '__name__', callback)}: {type(e).__name__}: {e}")
+                self.pick_place.fail(f"{type(e).__name__}: {e}")
+
+    def on_firmware_line(self, line):
+        event = COMPLETION_LINES.get(line)
+        if event is None:
+            return
+        if event in ('move', 'gripper_closed', 'gripper_opened'):
+            self.pick_place.handle_event(event)
+        with self.condition:
+            self.event_counts[event] = self.event_counts.get(event, 0) + 1
+            self.condition.notify_all()
+
+    def event_count(self, event):
+        with self.condition:
+            return self.event_counts.get(event, 0)
+
+    def wait_for_event(self, event, since, timeout):
+        # True once `event` has been seen more than `since` times
+        if self.link is None:
+            return False
+        with self.condition:
+            return self.condition.wait_for(lambda: self.event_counts.get(event, 0) > since, timeout)
+
+    def send_command(self, command):
+        if self.link is not None:
+            self.link.send_command(command)
+
+    def run_command(self, command, event):
+        since = self.event_count(event)
+        self.send_command(command)
+        completed = self.wait_for_event(event, since, COMPLETION_TIMEOUTS[event])
+        if not completed and self.link is not None:
+            print(f"Warning: no completion reported for {event} within {COMPLETION_TIMEOUTS[event]} s.")
+        return completed
+
+    def home(self):
+        completed = self.run_command("H", 'homing')
+        self.previous_theta = np.zeros(6)
+        return completed
+
+    def shutdown(self):
+        return self.run_command("S", 'shutdown')
+
+    def reset(self):
+        completed = self.run_command("R", 'reset')
+        self.previous_theta = np.zeros(6)
+        return completed
+
+    def open_gripper(self):
+        return self.run_command("OPEN", 'gripper_opened')
+
+    def close_gripper(self):
+        return self.run_command("CLOSE", 'gripper_closed')
+
+    def solve(self, target_position, restricted=True):
+        # (theta, residual_mm, converged) from the current pose
+        from kinematics import solve_ik
+        return solve_ik(target_position, self.previous_theta, self.seed_index, restricted)
+
+    def send_joint_angles(self, joint_angles_rad):
+        # Time the move from the pose last sent (previous_theta), not from zero
+        _, start_angles = format_move_command(self.previous_theta)
+        _, inverted_angles = format_move_command(joint_angles_rad)
+        profile, movement_time = plan_move(start_angles, inverted_angles)
+        if self.link is not None:
+            self.link.send_move(inverted_angles, wait=False, profile=profile)
+        self.previous_theta = joint_angles_rad
+        return movement_time
+
+    def check_reachable(self, target):
+        # Raises UnreachableTarget if the reach map rules out the downward tool at
+        # this (uncompensated) target
+        x, y, z = target
+        if self.reach_map is not None and not self.reach_map.reachable((x, y, compensate_z(x, z))):
+            from reachmap import UnreachableTarget
+            raise UnreachableTarget(f"({x:.1f}, {y:.1f}, {z:.1f}) mm is out of reach for the downward tool")
+
+    def start_move(self, target, restricted=True):
+        # Solve and send without waiting for the arm. Downward-tool targets get the
+        # Z sag compensation, as in the GUI, and are checked against the reach map
+        # first. Returns the move result; if IK doesn't converge nothing is sent
+        # and the result has an 'error'.
+        if restricted:
+            self.check_reachable(target)
+        x, y, z = target
+        if restricted:
+            z = compensate_z(x, z)
+        with self.motion_lock:
+            start = time.perf_counter()
+            theta, residual, converged = self.solve(np.array([x, y, z]), restricted)
+            solve_time = time.perf_counter() - start
+            result = {
+                'target': [float(x), float(y), float(z)],
+                'joint_angles_deg': [float(angle) for angle in format_move_command(theta)[1]],
+                'residual_mm': float(residual),
+                'converged': converged,
+                'solve_ms': solve_time * 1000,
+            }
+            if not converged:
+                result['error'] = f"IK did not converge (position residual {residual:.2f} mm), move not sent"
+                return result
+            result['since'] = self.event_count('move')
+            result['movement_time'] = self.send_joint_angles(theta)
+        return result
+
+    def move_to(self, target, restricted=True, on_solved=None):
+        # Blocks until the firmware reports the move done, or the motion-time
+        # estimate plus 1 s passes. on_solved(result) runs once the move is sent.
+        result = self.start_move(target, restricted)
+        if 'error' in result:
+            result['completed'] = False
+            return result
+        since = result.pop('since')
+        if on_solved is not None:
+            on_solved(dict(result))
+        result['completed'] = self.wait_for_event('move', since, result['movement_time'] + 1.0)
+        return result
+
+    def pick_move(self, target, restricted, on_sent, on_failed):
+        # PickAndPlace move callback, on the dispatch thread
+        result = self.start_move(target, restricted)
+        if 'error' in result:
+            on_failed(result['error'])
+        else:
+            on_sent(result['movement_time'])
+
+    def start_pick(self, target, future):
+        # On the dispatch thread. The cycle can end inside start() (a failed
+        # approach), so the waiter is set first.
+        if self.pick_place.busy:
+            future.set_result(self.failed_report(target, "a pick cycle is already running"))
+            return
+        self.pick_waiter = future
+        self.pick_place.start(target)
+
+    def on_pick_complete(self, report):
+        self.pick_reports.append(report)
+        if self.pick_waiter is not None:
+            self.pick_waiter.set_result(report)
+            self.pick_waiter = None
+
+    def abort_pick(self):
+        self.pick_place.abort()
+        self.pick_waiter = None
+
+    def failed_report(self, target, reason, total=0.0):
+        return {'target': tuple(target), 'phases': {}, 'timed_out': [], 'failed': reason, 'total': total}
+
+    def pick(self, position, height=PICK_HEIGHT, timeout=PICK_TIMEOUT):
+        # One full cycle at workspace (x, y): approach, grip, lift, drop in the
+        # bowl. Returns the cycle report (see PickAndPlace). Both downward moves
+        # are checked up front, so an unreachable part raises before the arm moves.
+        # A cycle with no report after `timeout` s is aborted and reported failed.
+        x, y = position
+        self.check_reachable((x, y, height))
+        self.check_reachable((x, y, self.pick_place.lift_height))
+        with self.pick_lock:
+            future = Future()
+            self.call_soon(self.start_pick, (x, y, height), future)
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                self.call_soon(self.abort_pick)
+                report = self.failed_report((x, y, height), f"no report within {timeout:g} s", timeout)
+                self.pick_reports.append(report)
+                return report
+
+    def start_vision(self, source=0, calibration_path=None):
+        # Camera + VisionPipeline on a background thread, no Qt. The default
+        # calibration_path is the GUI's stored calibration.
+        from framegrab import LatestFrameGrabber
+        from visionpipe import VisionPipeline
+        from visioncal import DEFAULT_PATH
+        self.vision_pipeline = VisionPipeline(calibration_path=calibration_path or DEFAULT_PATH)
+        self.grabber = LatestFrameGrabber(source)
+        self.vision_thread = threading.Thread(target=self.run_vision, daemon=True)
+        self.vision_thread.start()
+
+    def run_vision(self):
+        while self.grabber.running:
+            grabbed = self.grabber.read(timeout=0.5)
+            if grabbed is not None:
+                frame, timestamp, _ = grabbed
+                self.vision_pipeline.process_frame(frame, draw_debug=False, timestamp=timestamp)
+
+    def wait_for_vision(self, timeout=COMPLETION_TIMEOUTS['vision']):
+        # True once the box corners are calibrated
+        deadline = time.monotonic() + timeout
+        while self.vision_pipeline.stable_corners is None:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def pick_queued(self, limit=None):
+        # Picks tracked objects oldest first until the queue is empty (or limit
+        # picks). Tracking is paused while the arm is over the work area.
+        from reachmap import UnreachableTarget
+        tracker = self.vision_pipeline.tracker
+        reports = []
+        while limit is None or len(reports) < limit:
+            track = tracker.next_target()
+            if track is None:
+                break
+            tracker.paused = True
+            try:
+                reports.append(self.pick(track.position))
+            except UnreachableTarget as e:
+                print(f"Skipping object #{track.id}: {e}")
+            finally:
+                tracker.remove(track.id)
+                tracker.paused = False
+        return reports
+
+    def close(self):
+        if self.grabber is not None:
+            self.grabber.close()
+            self.vision_thread.join(timeout=2.0)
+        self.call_soon(None)
+        self.dispatcher.join(timeout=2.0)
+        if self.link is not None:
+            self.link.close()
+
+def peak_memory_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the arm without the GUI.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--port", help="firmware serial port (omit for a dry run)")
+    target.add_argument("--sim", action="store_true", help="drive a SimulatedArm on a local pty")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--binary", action="store_true", help="use binary frames instead of ASCII")
+    parser.add_argument("--seed-index", help="IK seed index path (default: the one seedindex.py builds)")
+    parser.add_argument("--reach-map", help="reachability map path (default: the one reachmap.py builds)")
+    parser.add_argument("--stats", action="store_true", help="print run time and peak memory to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("home", "shutdown", "reset", "open", "close"):
+        commands.add_parser(name)
+    move = commands.add_parser("move", help="move the tool to X Y Z (mm)")
+    move.add_argument("position", type=float, nargs=3)
+    move.add_argument("--free", action="store_true", help="position only, no downward tool")
+    pick = commands.add_parser("pick", help="pick at each X Y pair (mm) and drop in the bowl")
+    pick.add_argument("positions", type=float, nargs="+")
+    vision = commands.add_parser("pick-vision", help="calibrate from the camera and pick every tracked object")
+    vision.add_argument("--camera", default="0", help="camera index or video path")
+    vision.add_argument("--count", type=int, help="stop after this many picks")
+    vision.add_argument("--settle", type=float, default=1.0, help="s to track objects before picking")
+    args = parser.parse_args()
+
+    from reachmap import UnreachableTarget, load_reach_map, DEFAULT_PATH
+    start = time.perf_counter()
+    sim = None
+    if args.sim:
+        from simarm import SimulatedArm
+        sim = SimulatedArm()
+        port = sim.port_name
+    else:
+        port = args.port
+    if port is not None:
+        core = ArmCore.open(port, args.baudrate, args.binary, args.seed_index, args.reach_map)
+    else:
+        core = ArmCore(seed_index=load_seed_index(args.seed_index),
+                       reach_map=load_reach_map(args.reach_map or DEFAULT_PATH))
+
+    try:
+        if args.command in ("home", "shutdown", "reset"):
+            results = [{'command': args.command, 'completed': getattr(core, args.command)()}]
+        elif args.command == "open":
+            results = [{'command': "open", 'completed': core.open_gripper()}]
+        elif args.command == "close":
+            results = [{'command': "close", 'completed': core.close_gripper()}]
+        elif args.command == "move":
+            results = [core.move_to(args.position, restricted=not args.free)]
+        elif args.command == "pick":
+            if len(args.positions) % 2:
+                parser.error("pick takes X Y pairs")
+            pairs = np.reshape(args.positions, (-1, 2))
+            results = (core.pick(position) for position in pairs)  # printed as each finishes
+        else:
+            camera = int(args.camera) if args.camera.isdigit() else args.camera
+            core.start_vision(camera)
+            if not core.wait_for_vision():
+                sys.exit("Vision did not calibrate.")
+            time.sleep(args.settle)
+            results = core.pick_queued(args.count)
+        failed = False
+        for result in results:
+            print(json.dumps(result, default=float))
+            failed = failed or bool(result.get('error') or result.get('failed'))
+    except UnreachableTarget as e:
+        print(f"Rejected: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        core.close()
+        if sim is not None:
+            sim.close()
+
+    if args.stats:
+        print(f"{args.command}: {time.perf_counter() - start:.2f} s, "
+              f"{time.process_time():.2f} s CPU, peak memory {peak_memory_mb():.0f} MB", file=sys.stderr)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,206 @@
+import time
+import threading
+import numpy as np
+from frameproto import (AsciiCodec, FrameDecoder, Frame, ASCII_OPCODES, OP_MOVE, OP_ACK, OP_NACK,
+                        format_move_text)
+
+SEQ_COUNT = 256  # 8-bit sequence numbers
+
+# Firmware status lines that mark the end of a command
+COMPLETION_LINES = {
+    "Homing sequence completed.": "homing",
+    "Shutdown sequence completed.": "shutdown",
+    "Reset sequence completed.": "reset",
+    "Move completed.": "move",
+    "BLDC motor closed": "gripper_closed",
+    "BLDC motor opened and set to low power mode": "gripper_opened",
+}
+
+def format_move_command(joint_angles_rad):
+    # IK joint angles -> firmware "M" command and the degrees actually sent
+    joint_angles_deg = np.degrees(joint_angles_rad)
+
+    # Invert angles for joints 1, 3, 4, and 5. Don't invert joints 2 and 6.
+    inverted_angles = [-angle if i in [0, 2, 3, 4] else angle for i, angle in enumerate(joint_angles_deg)]
+
+    # Make joint 6 rotate the opposite magnitude of joint 1
+    inverted_angles[5] = -inverted_angles[0]
+
+    return format_move_text(inverted_angles), inverted_angles
+
+class SerialLink:
+    # Thread-safe wrapper around the firmware serial port. Writes are serialized
+    # with a lock and a reader thread decodes everything the firmware sends.
+    #
+    # ASCII codec (default, matches fullcntl.ino): moves are acknowledged with an
+    # "OK" line, other commands are fire-and-forget.
+    # Binary codec (frameproto): every frame carries a sequence number and is
+    # ACKed or NACKed by seq; NACKed or timed-out frames are resent up to
+    # `retries` times and then counted as dropped. The reader thread checks for
+    # timed-out frames too, so frames sent with wait=False are retried even if
+    # nothing blocks on the window, and a seq is never reused while pending.
+    #
+    # At most ack_window acknowledged commands are on the wire at once. The Mega's
+    # RX buffer is 64 bytes and an ASCII move is ~60, hence the default of 1.
+    # Text lines from the firmware are passed to every listener.
+    def __init__(self, serial_port, codec=None, ack_window=1, ack_timeout=0.5, retries=3):
+        self.serial_port = serial_port
+        self.codec = codec if codec is not None else AsciiCodec()
+        self.decoder = FrameDecoder()
+        self.write_lock = threading.Lock()
+        self.ack_window = ack_window
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.ack_condition = threading.Condition()
+        self.next_seq = 0
+        self.in_flight = {}  # binary: seq -> [data, sent at, attempts]
+        self.ascii_in_flight = 0
+        self.retransmits = 0
+        self.dropped = 0
+        self.listeners = []
+        self.running = True
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.reader.start()
+
+    @classmethod
+    def open(cls, port, baudrate=115200, **kwargs):
+        import serial
+        return cls(serial.Serial(port, baudrate, timeout=0.1), **kwargs)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def write(self, data):
+        with self.write_lock:
+            self.serial_port.write(data)
+
+    def send_command(self, command):
+        # Text command ("H", "S", "R", "OPEN", "CLOSE"), encoded for the active codec
+        return self.send(ASCII_OPCODES[command], wait=False)
+
+    def send_move(self, joint_angles_deg, wait=True, profile=None):
+        # joint_angles_deg in firmware sign convention (see format_move_command).
+        # profile is an optional (speeds, accels) pair from motiontime.synchronized_profile.
+        return self.send(OP_MOVE, joint_angles_deg, wait, profile)
+
+    def send(self, opcode, joint_angles_deg=None, wait=True, profile=None):
+        # With wait=True, blocks until the window has room. Returns False if that
+        # needed a timeout (ASCII: ack never came, e.g. firmware without "OK";
+        # binary: an older frame was dropped after its retries).
+        acknowledged = True
+        with self.ack_condition:
+            if wait:
+                acknowledged = self.wait_for_window()
+            seq = self.allocate_seq()
+            data = self.codec.encode(opcode, seq, joint_angles_deg, profile)
+            if self.codec.binary:
+                self.in_flight[seq] = [data, time.monotonic(), 1]
+            elif opcode == OP_MOVE:
+                self.ascii_in_flight += 1
+        self.write(data)
+        return acknowledged
+
+    def allocate_seq(self):
+        # Called with ack_condition held. Skips sequence numbers still awaiting an
+        # ACK, so a late ACK can't be taken for a newer frame's.
+        while len(self.in_flight) >= SEQ_COUNT:
+            if not self.ack_condition.wait_for(lambda: len(self.in_flight) < SEQ_COUNT, self.ack_timeout):
+                self.resend_expired()
+        while self.next_seq in self.in_flight:
+            self.next_seq = (self.next_seq + 1) % SEQ_COUNT
+        seq = self.next_seq
+        self.next_seq = (self.next_seq + 1) % SEQ_COUNT
+        return seq
+
+    def wait_for_window(self):
+        # Called with ack_condition held
+        if not self.codec.binary:
+            if self.ack_condition.wait_for(lambda: self.ascii_in_flight < self.ack_window, self.ack_timeout):
+                return True
+            self.ascii_in_flight = self.ack_window - 1
+            return False
+
+        acknowledged = True
+        while len(self.in_flight) >= self.ack_window:
+            if not self.ack_condition.wait_for(lambda: len(self.in_flight) < self.ack_window, self.ack_timeout):
+                acknowledged = self.resend_expired() and acknowledged
+        return acknowledged
+
+    def resend_expired(self):
+        # Called with ack_condition held. Returns False if a frame was given up on.
+        now = time.monotonic()
+        acknowledged = True
+        for seq, entry in list(self.in_flight.items()):
+            if now - entry[1] >= self.ack_timeout:
+                acknowledged = self.resend(seq) and acknowledged
+        return acknowledged
+
+    def resend(self, seq):
+        # Called with ack_condition held. Returns False if the frame was given up on.
+        entry = self.in_flight[seq]
+        if entry[2] > self.retries:
+            del self.in_flight[seq]
+            self.dropped += 1
+            print(f"Frame {seq} dropped after {self.retries} retries")
+            self.ack_condition.notify_all()
+            return False
+        entry[1] = time.monotonic()
+        entry[2] += 1
+        self.retransmits += 1
+        self.write(entry[0])
+        return True
+
+    def wait_until_idle(self, timeout=None):
+        # Block until every acknowledged command has been acked (or given up on)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.ack_condition:
+            while self.in_flight or self.ascii_in_flight:
+                wait = self.ack_timeout
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return False
+                if not self.ack_condition.wait(wait):
+                    if self.codec.binary:
+                        self.resend_expired()
+                    else:
+                        self.ascii_in_flight = 0  # no "OK" coming; assume the firmware doesn't send them
+            return True
+
+    def handle_event(self, event):
+        if isinstance(event, Frame):
+            with self.ack_condition:
+                if event.opcode == OP_ACK:
+                    self.in_flight.pop(event.seq, None)
+                elif event.opcode == OP_NACK and event.seq in self.in_flight:
+                    self.resend(event.seq)
+                self.ack_condition.notify_all()
+        elif isinstance(event, tuple):
+            pass  # corrupted frame from the firmware; the timeout path resends
+        elif event == "OK" and not self.codec.binary:
+            with self.ack_condition:
+                self.ascii_in_flight = max(0, self.ascii_in_flight - 1)
+                self.ack_condition.notify_all()
+        elif event:
+            for callback in self.listeners:
+                callback(event)
+
+    def read_loop(self):
+        while self.running:
+            try:
+                data = self.serial_port.read(self.serial_port.in_waiting or 1)
+            except Exception:
+                if not self.running:
+                    break
+                raise
+            for event in self.decoder.feed(data):
+                self.handle_event(event)
+            if self.in_flight:
+                # The port's read timeout (0.1 s) keeps this running while idle
+                with self.ack_condition:
+                    self.resend_expired()
+
+    def close(self):
+        self.running = False
+        self.reader.join(timeout=1.0)
+        self.serial_port.close()
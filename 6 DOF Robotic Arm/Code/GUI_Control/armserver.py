@@ -0,0 +1,261 @@
+import sys
+import json
+import asyncio
+import argparse
+import itertools
+from collections import deque
+from armcore import ArmCore, load_seed_index
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_PENDING = 32  # queued jobs per client before the server stops reading from it
+
+# Request fields per op (besides "op" and the optional "id"):
+#   move     position [x, y, z] (mm), restricted (default true)
+#   pick     position [x, y] (mm)
+#   gripper  command "OPEN" or "CLOSE"
+#   home     -
+#   batch    jobs [request, ...], queued in order as separate jobs
+OPS = ('move', 'pick', 'gripper', 'home')
+
+class ClientSession:
+    def __init__(self, session_id, writer, max_pending):
+        self.id = session_id
+        self.writer = writer
+        self.jobs = asyncio.Queue(max_pending)
+        self.next_job_id = itertools.count(1)
+        self.closed = False
+
+    def send(self, message):
+        if not self.closed:
+            self.writer.write((json.dumps(message, default=float) + "\n").encode())
+
+class CommandServer:
+    # Newline-delimited JSON command server around an ArmCore. Each client has
+    # its own bounded job queue; when it is full the server stops reading that
+    # client (backpressure through the socket) without affecting the others. One
+    # worker runs jobs on the arm, taking the next job from each client with
+    # pending work in turn, so a long batch from one client doesn't starve the
+    # rest. Each job is answered with "queued", "solved" (moves, with the IK
+    # result, as soon as the command is sent) and then "done" or "error" (with
+    # the result, if the job ran but its move or pick cycle failed).
+    # ArmCore calls block, so they run in the default executor.
+    def __init__(self, core, max_pending=MAX_PENDING):
+        self.core = core
+        self.max_pending = max_pending
+        self.sessions = deque()
+        self.session_ids = itertools.count(1)
+        self.work_available = asyncio.Event()
+        self.server = None
+        self.worker = None
+        self.jobs_done = 0
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        if unix_path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client, unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port)
+        self.worker = asyncio.create_task(self.run_worker())
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+
+    async def handle_client(self, reader, writer):
+        session = ClientSession(next(self.session_ids), writer, self.max_pending)
+        self.sessions.append(session)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    session.send({'status': 'error', 'error': "invalid JSON"})
+                    continue
+                if not isinstance(request, dict):
+                    session.send({'status': 'error', 'error': "request must be a JSON object"})
+                    continue
+                requests = request.get('jobs', []) if request.get('op') == 'batch' else [request]
+                if not isinstance(requests, list):
+                    session.send({'id': request.get('id'), 'status': 'error', 'error': "batch jobs must be a list"})
+                    continue
+                for job in requests:
+                    await self.submit(session, job)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Pending jobs of a departed client are dropped; a running one finishes
+            session.closed = True
+            self.sessions.remove(session)
+            writer.close()
+
+    async def submit(self, session, request):
+        if not isinstance(request, dict):
+            session.send({'id': next(session.next_job_id), 'status': 'error', 'error': "job must be a JSON object"})
+            return
+        job_id = request.get('id', next(session.next_job_id))
+        if request.get('op') not in OPS:
+            session.send({'id': job_id, 'status': 'error', 'error': f"unknown op {request.get('op')!r}"})
+            return
+        await session.jobs.put((job_id, request))
+        session.send({'id': job_id, 'status': 'queued', 'pending': session.jobs.qsize()})
+        self.work_available.set()
+
+    async def next_job(self):
+        # Round-robin over clients with pending jobs
+        while True:
+            for _ in range(len(self.sessions)):
+                session = self.sessions[0]
+                self.sessions.rotate(-1)
+                if not session.jobs.empty():
+                    return session, session.jobs.get_nowait()
+            self.work_available.clear()
+            await self.work_available.wait()
+
+    async def run_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session, (job_id, request) = await self.next_job()
+            try:
+                result = await loop.run_in_executor(None, self.execute, request,
+                                                    lambda message: loop.call_soon_threadsafe(session.send, dict(id=job_id, **message)))
+                # A move IK couldn't solve (nothing sent) or a pick cycle that failed
+                failure = result.get('error') or result.get('failed')
+                if failure:
+                    session.send({'id': job_id, 'status': 'error', 'error': failure, 'result': result})
+                else:
+                    session.send({'id': job_id, 'status': 'done', 'result': result})
+            except Exception as e:
+                # A bad request or a failed job; either way the server keeps serving
+                session.send({'id': job_id, 'status': 'error', 'error': str(e)})
+            self.jobs_done += 1
+
+    def execute(self, request, notify):
+        # On an executor thread; notify(message) reports progress to the client
+        op = request['op']
+        if op == 'move':
+            x, y, z = (float(value) for value in request['position'])
+            return self.core.move_to((x, y, z), request.get('restricted', True),
+                                     on_solved=lambda result: notify({'status': 'solved', 'result': result}))
+        if op == 'pick':
+            x, y = (float(value) for value in request['position'])
+            return self.core.pick((x, y))
+        if op == 'gripper':
+            command = request['command'].upper()
+            if command not in ("OPEN", "CLOSE"):
+                raise ValueError(f"gripper command must be OPEN or CLOSE, not {command!r}")
+            completed = self.core.open_gripper() if command == "OPEN" else self.core.close_gripper()
+            return {'completed': completed}
+        return {'completed': self.core.home()}
+
+class CommandClient:
+    # Minimal asyncio client: submit() returns the job's final message ("done" or
+    # "error") once it arrives; every message also goes to on_message, if given.
+    def __init__(self, reader, writer, on_message=None):
+        self.reader = reader
+        self.writer = writer
+        self.on_message = on_message
+        self.ids = itertools.count(1)
+        self.futures = {}
+        self.listener = asyncio.create_task(self.listen())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, on_message=None):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, on_message)
+
+    async def listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if self.on_message is not None:
+                self.on_message(message)
+            if message.get('status') in ('done', 'error'):
+                future = self.futures.pop(message.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        for future in self.futures.values():
+            future.set_exception(ConnectionError("server closed the connection"))
+
+    async def submit(self, request):
+        return (await self.submit_batch([request]))[0]
+
+    async def submit_batch(self, requests):
+        # Sent as one batch line; results come back in submission order
+        futures = []
+        jobs = []
+        for request in requests:
+            job_id = f"c{next(self.ids)}"
+            jobs.append(dict(request, id=job_id))
+            futures.append(self.futures.setdefault(job_id, asyncio.get_running_loop().create_future()))
+        self.writer.write((json.dumps({'op': 'batch', 'jobs': jobs}) + "\n").encode())
+        await self.writer.drain()
+        return await asyncio.gather(*futures)
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+
+async def serve(core, host, port, unix_path):
+    server = CommandServer(core)
+    await server.start(host, port, unix_path)
+    print(f"Listening on {unix_path or f'{host}:{port}'}")
+    await server.server.serve_forever()
+
+async def send(requests, host, port, unix_path):
+    client = await CommandClient.connect(host, port, unix_path, on_message=lambda message: print(json.dumps(message)))
+    results = await client.submit_batch(requests)
+    await client.close()
+    return all(result['status'] == 'done' for result in results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve arm commands over a local socket, or send some.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--listen-port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--port", help="firmware serial port (omit for a dry run)")
+    target.add_argument("--sim", action="store_true", help="drive a SimulatedArm on a local pty")
+    parser.add_argument("--binary", action="store_true", help="use binary frames instead of ASCII")
+    parser.add_argument("--seed-index", help="IK seed index path (default: the one seedindex.py builds)")
+    parser.add_argument("--reach-map", help="reachability map path (default: the one reachmap.py builds)")
+    parser.add_argument("--send", nargs="+", metavar="JSON", help="act as a client: send these requests and exit")
+    args = parser.parse_args()
+
+    if args.send:
+        ok = asyncio.run(send([json.loads(request) for request in args.send], args.host, args.listen_port, args.unix))
+        sys.exit(0 if ok else 1)
+
+    from reachmap import load_reach_map, DEFAULT_PATH
+    sim = None
+    if args.sim:
+        from simarm import SimulatedArm
+        sim = SimulatedArm()
+    port = sim.port_name if sim is not None else args.port
+    if port is not None:
+        core = ArmCore.open(port, binary=args.binary, seed_index_path=args.seed_index, reach_map_path=args.reach_map)
+    else:
+        core = ArmCore(seed_index=load_seed_index(args.seed_index),
+                       reach_map=load_reach_map(args.reach_map or DEFAULT_PATH))
+    try:
+        asyncio.run(serve(core, args.host, args.listen_port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.close()
+        if sim is not None:
+            sim.close()
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from kinematics import solve_ik
+
+# Below this many targets the pool start-up costs more than it saves
+MIN_PARALLEL_TARGETS = 64
+
+def _solve_one(args):
+    target_position, previous_theta, seed_index, restricted = args
+    return solve_ik(target_position, previous_theta, seed_index, restricted)
+
+def batch_inverse_kinematics(targets, previous_theta=None, seed_index=None, restricted=True,
+                             chain=False, processes=None):
+    # Solve IK for an (N, 3) array of targets. Returns (N, 6) joint angles,
+    # (N,) position residuals in mm and (N,) convergence flags.
+    #
+    # Independent mode: every target uses previous_theta for its seed and
+    # joint-change penalty, so targets are spread over a process pool and the
+    # output is identical to solving them one by one.
+    # Chain mode: each target is seeded from the solution before it, as for an
+    # ordered path. That is inherently sequential and runs in this process.
+    targets = np.atleast_2d(np.asarray(targets, dtype=float))
+    if previous_theta is None:
+        previous_theta = np.zeros(6)
+    n = len(targets)
+
+    if chain:
+        results = []
+        theta = previous_theta
+        for target in targets:
+            result = solve_ik(target, theta, seed_index, restricted)
+            theta = result[0]
+            results.append(result)
+    else:
+        jobs = [(target, previous_theta, seed_index, restricted) for target in targets]
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if processes <= 1 or n < MIN_PARALLEL_TARGETS:
+            results = [_solve_one(job) for job in jobs]
+        else:
+            chunksize = max(1, n // (4 * processes))
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(_solve_one, jobs, chunksize=chunksize))
+
+    thetas = np.array([result[0] for result in results]).reshape(n, 6)
+    residuals = np.array([result[1] for result in results])
+    converged = np.array([result[2] for result in results], dtype=bool)
+    return thetas, residuals, converged
@@ -0,0 +1,72 @@
+import time
+import threading
+import cv2
+
+class LatestFrameGrabber:
+    # Reads a camera on its own thread and keeps only the newest frame, so a slow
+    # consumer always gets the freshest image instead of a backlog queued in the
+    # driver. Frames replaced before anyone took them are counted in `dropped`.
+    def __init__(self, source=0, reopen_delay=1.0):
+        self.source = source
+        self.reopen_delay = reopen_delay
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None  # time.monotonic() when the frame was read
+        self.sequence = 0  # frames captured so far
+        self.taken_sequence = 0  # sequence of the last frame handed out
+        self.dropped = 0
+        self.cap = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def open(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = cv2.VideoCapture(self.source)
+        if self.cap.isOpened():
+            # Not every backend honours this; the capture loop drains the driver regardless
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        else:
+            print("Failed to open camera")
+
+    def run(self):
+        self.open()
+        while self.running:
+            if not self.cap.isOpened():
+                time.sleep(self.reopen_delay)
+                self.open()
+                continue
+
+            ret, frame = self.cap.read()
+            timestamp = time.monotonic()
+            if not ret:
+                print("Failed to capture frame")
+                time.sleep(self.reopen_delay)
+                self.open()
+                continue
+
+            with self.condition:
+                if self.sequence > self.taken_sequence:
+                    self.dropped += 1
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.condition.notify_all()
+        self.cap.release()
+
+    def read(self, timeout=None):
+        # Newest frame not handed out yet, as (frame, timestamp, sequence). Waits for
+        # one if the consumer is ahead of the camera; None on timeout or close.
+        with self.condition:
+            ready = self.condition.wait_for(lambda: self.sequence > self.taken_sequence or not self.running, timeout)
+            if not ready or not self.running:
+                return None
+            self.taken_sequence = self.sequence
+            return self.frame, self.timestamp, self.sequence
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout=2.0)
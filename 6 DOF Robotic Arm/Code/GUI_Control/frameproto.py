@@ -0,0 +1,156 @@
+import struct
+from collections import namedtuple
+
+# Binary frame, all integers little-endian:
+#   SYNC | version | opcode | seq | length | payload[length] | CRC-16/CCITT-FALSE
+# The CRC covers version through payload. SYNC is above 0x7F, so firmware text
+# lines (plain ASCII) can share the stream and are split out by FrameDecoder.
+SYNC = 0xA5
+PROTOCOL_VERSION = 1
+HEADER_SIZE = 5
+CRC_SIZE = 2
+MAX_PAYLOAD = 64
+
+# Host -> firmware
+OP_HOME = 0x01
+OP_SHUTDOWN = 0x02
+OP_RESET = 0x03
+OP_MOVE = 0x10
+OP_OPEN = 0x20
+OP_CLOSE = 0x21
+
+# Firmware -> host
+OP_ACK = 0x80
+OP_NACK = 0x81
+
+# NACK reasons
+NACK_BAD_CRC = 1
+NACK_BAD_VERSION = 2
+NACK_BAD_OPCODE = 3
+NACK_BAD_LENGTH = 4
+
+# Opcodes that map onto the original newline-terminated ASCII commands
+ASCII_COMMANDS = {
+    OP_HOME: "H",
+    OP_SHUTDOWN: "S",
+    OP_RESET: "R",
+    OP_OPEN: "OPEN",
+    OP_CLOSE: "CLOSE",
+}
+ASCII_OPCODES = {text: opcode for opcode, text in ASCII_COMMANDS.items()}
+
+MOVE_FORMAT = struct.Struct("<6f")  # six joint angles in degrees, firmware sign convention
+# Optional synchronized profile after the angles: per-joint speed (steps/s) and
+# acceleration (steps/s^2). Without it the firmware uses its default profile.
+PROFILE_FORMAT = struct.Struct("<6H6H")
+MOVE_PAYLOAD_SIZES = (MOVE_FORMAT.size, MOVE_FORMAT.size + PROFILE_FORMAT.size)
+
+Frame = namedtuple("Frame", ["opcode", "seq", "payload"])
+
+def crc16_ccitt(data, crc=0xFFFF):
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return crc
+
+def encode_frame(opcode, seq, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD}")
+    body = bytes([PROTOCOL_VERSION, opcode, seq & 0xFF, len(payload)]) + payload
+    return bytes([SYNC]) + body + struct.pack("<H", crc16_ccitt(body))
+
+def encode_move_payload(joint_angles_deg, profile=None):
+    payload = MOVE_FORMAT.pack(*joint_angles_deg)
+    if profile is not None:
+        speeds, accels = profile
+        payload += PROFILE_FORMAT.pack(*(int(value) for value in speeds), *(int(value) for value in accels))
+    return payload
+
+def decode_move_payload(payload):
+    return list(MOVE_FORMAT.unpack_from(payload))
+
+def decode_move_profile(payload):
+    # (speeds, accels), or None for a plain move
+    if len(payload) == MOVE_FORMAT.size:
+        return None
+    values = PROFILE_FORMAT.unpack_from(payload, MOVE_FORMAT.size)
+    return list(values[:6]), list(values[6:])
+
+def format_move_text(joint_angles_deg, profile=None):
+    # ASCII "M" line: six angles, optionally followed by six speeds and six accelerations
+    fields = [f"{angle:.5f}" for angle in joint_angles_deg]
+    if profile is not None:
+        speeds, accels = profile
+        fields += [str(int(value)) for value in speeds] + [str(int(value)) for value in accels]
+    return "M" + ",".join(fields)
+
+def encode_ack(seq):
+    return encode_frame(OP_ACK, seq)
+
+def encode_nack(seq, reason):
+    return encode_frame(OP_NACK, seq, bytes([reason]))
+
+class FrameDecoder:
+    # Incremental decoder for a byte stream mixing frames and text lines. feed()
+    # returns a list of Frame tuples and str lines in arrival order. Frames that
+    # fail their CRC or header checks come back as ("error", reason, seq) tuples.
+    def __init__(self):
+        self.buffer = bytearray()
+        self.text = bytearray()
+
+    def feed(self, data):
+        self.buffer.extend(data)
+        events = []
+        while self.buffer:
+            if self.buffer[0] != SYNC:
+                byte = self.buffer.pop(0)
+                if byte == ord("\n"):
+                    events.append(self.text.decode(errors="replace").strip())
+                    self.text.clear()
+                elif byte != ord("\r"):
+                    self.text.append(byte)
+                continue
+
+            if len(self.buffer) < HEADER_SIZE:
+                break
+            version, opcode, seq, length = self.buffer[1:5]
+            if version != PROTOCOL_VERSION:
+                events.append(("error", NACK_BAD_VERSION, seq))
+                del self.buffer[0]
+                continue
+            if length > MAX_PAYLOAD:
+                events.append(("error", NACK_BAD_LENGTH, seq))
+                del self.buffer[0]
+                continue
+            total = HEADER_SIZE + length + CRC_SIZE
+            if len(self.buffer) < total:
+                break
+            body = bytes(self.buffer[1:HEADER_SIZE + length])
+            (crc,) = struct.unpack("<H", self.buffer[HEADER_SIZE + length:total])
+            if crc != crc16_ccitt(body):
+                # Header looked sane, so skip the whole claimed frame rather than
+                # letting its payload leak into the text stream
+                events.append(("error", NACK_BAD_CRC, seq))
+                del self.buffer[:total]
+                continue
+            events.append(Frame(opcode, seq, body[4:]))
+            del self.buffer[:total]
+        return events
+
+class AsciiCodec:
+    # The original newline-terminated text protocol; the firmware acks moves with "OK"
+    binary = False
+
+    def encode(self, opcode, seq, joint_angles_deg=None, profile=None):
+        if opcode == OP_MOVE:
+            return (format_move_text(joint_angles_deg, profile) + "\n").encode()
+        return (ASCII_COMMANDS[opcode] + "\n").encode()
+
+class BinaryCodec:
+    binary = True
+
+    def encode(self, opcode, seq, joint_angles_deg=None, profile=None):
+        payload = encode_move_payload(joint_angles_deg, profile) if opcode == OP_MOVE else b""
+        return encode_frame(opcode, seq, payload)
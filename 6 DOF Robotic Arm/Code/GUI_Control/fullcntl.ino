@@ -18,6 +18,8 @@ AccelStepper stepperJ6(AccelStepper::DRIVER, J6_STEP_PIN, J6_DIR_PIN);
 bool homingInProgress = false;
 bool shutdown = false;
 bool resetting = false;
+bool moveInProgress = false;
+bool profileOverridden = false; // set while a synchronized M profile replaces the defaults
 bool bldcOpen = true;
 
 void setup() {
@@ -105,18 +107,23 @@ void loop() {
     
     if (command == "H" && !homingInProgress) {
       homingInProgress = true;
+      restoreDefaultProfile();
       startHomingSequence();
     }
     else if (command == "S" && !shutdown) {
       shutdown = true;
+      restoreDefaultProfile();
       startshutdown();
     }
     else if (command == "R" && !resetting) {
       resetting = true;
+      restoreDefaultProfile();
       resetAllJoints();
     }
     else if (command.startsWith("M")) {
       processJointAngles(command.substring(1));
+      moveInProgress = true;
+      Serial.println("OK"); // Ack so the host can stream moves without overrunning the RX buffer
     }
     else if (command == "OPEN") {
       openBLDC();
@@ -133,6 +140,21 @@ void loop() {
   stepperJ4.run();
   stepperJ5.run();
   stepperJ6.run();
+
+  // Report when a reset or M move has finished so the host doesn't have to guess
+  if ((resetting || moveInProgress) &&
+      stepperJ1.distanceToGo() == 0 && stepperJ2.distanceToGo() == 0 &&
+      stepperJ3.distanceToGo() == 0 && stepperJ4.distanceToGo() == 0 &&
+      stepperJ5.distanceToGo() == 0 && stepperJ6.distanceToGo() == 0) {
+    if (resetting) {
+      resetting = false;
+      Serial.println("Reset sequence completed.");
+    }
+    if (moveInProgress) {
+      moveInProgress = false;
+      Serial.println("Move completed.");
+    }
+  }
    
   // BLDC motor control
     motor.loopFOC();
@@ -158,24 +180,79 @@ void closeBLDC() {
 void processJointAngles(String angleString) {
   int commaIndex = 0;
   int nextCommaIndex = 0;
-  float angles[6];
+  float values[18] = {0};
+  int count = 0;
   
-  for (int i = 0; i < 6; i++) {
+  // Six angles, optionally followed by six speeds and six accelerations
+  for (int i = 0; i < 18 && commaIndex < angleString.length(); i++) {
     nextCommaIndex = angleString.indexOf(',', commaIndex);
     if (nextCommaIndex == -1) {
       nextCommaIndex = angleString.length();
     }
     
-    angles[i] = angleString.substring(commaIndex, nextCommaIndex).toFloat();
+    values[i] = angleString.substring(commaIndex, nextCommaIndex).toFloat();
     commaIndex = nextCommaIndex + 1;
+    count++;
+  }
+  
+  if (count == 18) {
+    // Synchronized move: the host scaled each joint so all of them arrive together
+    for (int i = 0; i < 6; i++) {
+      setJointProfile(i + 1, values[6 + i], values[12 + i]);
+    }
+    profileOverridden = true;
+  } else {
+    restoreDefaultProfile();
   }
   
-  moveJoint(1, angles[0]);
-  moveJoint(2, angles[1]);
-  moveJoint(3, angles[2]);
-  moveJoint(4, angles[3]);
-  moveJoint(5, angles[4]);
-  moveJoint(6, angles[5]);
+  moveJoint(1, values[0]);
+  moveJoint(2, values[1]);
+  moveJoint(3, values[2]);
+  moveJoint(4, values[3]);
+  moveJoint(5, values[4]);
+  moveJoint(6, values[5]);
+}
+
+void restoreDefaultProfile() {
+  if (!profileOverridden) {
+    return;
+  }
+  for (int i = 0; i < 6; i++) {
+    setJointProfile(i + 1, defaultMoveSpeed[i], defaultMoveAccel[i]);
+  }
+  profileOverridden = false;
+}
+
+void setJointProfile(int jointNumber, float speed, float accel) {
+  if (speed <= 0 || accel <= 0) {
+    return; // AccelStepper can't run a zero profile
+  }
+  switch (jointNumber) {
+    case 1:
+      stepperJ1.setMaxSpeed(speed);
+      stepperJ1.setAcceleration(accel);
+      break;
+    case 2:
+      stepperJ2.setMaxSpeed(speed);
+      stepperJ2.setAcceleration(accel);
+      break;
+    case 3:
+      stepperJ3.setMaxSpeed(speed);
+      stepperJ3.setAcceleration(accel);
+      break;
+    case 4:
+      stepperJ4.setMaxSpeed(speed);
+      stepperJ4.setAcceleration(accel);
+      break;
+    case 5:
+      stepperJ5.setMaxSpeed(speed);
+      stepperJ5.setAcceleration(accel);
+      break;
+    case 6:
+      stepperJ6.setMaxSpeed(speed);
+      stepperJ6.setAcceleration(accel);
+      break;
+  }
 }
 
 void resetAllJoints() {
@@ -1,289 +1,204 @@
+import os
 import sys
 import serial
 import numpy as np
 import cv2
 import time
-import math
-from scipy.optimize import minimize
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit
+import threading
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QCheckBox
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
-
-# DH parameters [a, alpha, d, theta]
-dhparams = np.array([
-    [23.4200, -np.pi/2, 110.5000, 0],
-    [180.0000, np.pi, 0, -np.pi/2],
-    [-43.5000, np.pi/2, 0, np.pi],
-    [0, -np.pi/2, -176.3500, 0],
-    [0, np.pi/2, 0, 0],
-    [0, np.pi, -125.0750, np.pi]
-])
-
-# Joint limits in radians
-joint_limits = np.array([
-    [-123.046875, 123.046875],
-    [-55.0088, 86.625],
-    [-72.134, 107.8675],
-    [-105.46975, 105.46975],
-    [-90, 90],
-    [-360, 360]
-]) * np.pi / 180  # Convert to radians
-
-joint_weights = np.array([1.0, 1.1, 0.9, 1.4, 0.8, 1.0])
-
-def dh_matrix(a, alpha, d, theta):
-    return np.array([
-        [np.cos(theta), -np.sin(theta)*np.cos(alpha), np.sin(theta)*np.sin(alpha), a*np.cos(theta)],
-        [np.sin(theta), np.cos(theta)*np.cos(alpha), -np.cos(theta)*np.sin(alpha), a*np.sin(theta)],
-        [0, np.sin(alpha), np.cos(alpha), d],
-        [0, 0, 0, 1]
-    ])
-
-def forward_kinematics(theta):
-    T = np.eye(4)
-    for i in range(6):
-        a, alpha, d, theta_offset = dhparams[i]
-        T = T @ dh_matrix(a, alpha, d, theta[i] + theta_offset)
-    return T
-
-def objective_function(theta, target_position, previous_theta):
-    T = forward_kinematics(theta)
-    current_position = T[:3, 3]
-    current_orientation = T[:3, :3]
-    
-    position_error = np.sum((current_position - target_position)**2)
-    
-    desired_z_axis = np.array([0, 0, -1])  # Pointing downward
-    current_z_axis = current_orientation[:, 2]
-    orientation_error = np.sum((current_z_axis - desired_z_axis)**2)
-    
-    joint_change_penalty = np.sum(joint_weights * (theta - previous_theta)**2)
-    
-    total_error = position_error + 10 * orientation_error + 0.1 * joint_change_penalty
-    return total_error
-
-def inverse_kinematics(target_position, previous_theta=None):
-    if previous_theta is None:
-        previous_theta = np.zeros(6)
-    
-    result = minimize(
-        lambda x: objective_function(x, target_position, previous_theta),
-        previous_theta,
-        method='L-BFGS-B',
-        bounds=joint_limits
-    )
-    return result.x
-
-def inverse_kinematics_unrestricted(target_position, previous_theta=None):
-    if previous_theta is None:
-        previous_theta = np.zeros(6)
-    
-    def objective_function_unrestricted(theta):
-        T = forward_kinematics(theta)
-        current_position = T[:3, 3]
-        position_error = np.sum((current_position - target_position)**2)
-        
-        joint_change_penalty = np.sum(joint_weights * (theta - previous_theta)**2)
-        
-        return position_error + 0.1 * joint_change_penalty
-
-    result = minimize(
-        objective_function_unrestricted,
-        previous_theta,
-        method='L-BFGS-B',
-        bounds=joint_limits
-    )
-    return result.x
+from kinematics import solve_ik, forward_kinematics
+from armlink import SerialLink, format_move_command, COMPLETION_LINES
+from trajectory import line_waypoints, stream_path
+from pickplace import PickAndPlace, PICK_HEIGHT
+from seedindex import SeedIndex
+from reachmap import load_reach_map
+from armcore import plan_move, compensate_z, COMPLETION_TIMEOUTS
+from framegrab import LatestFrameGrabber
+from visionpipe import VisionPipeline
+from stagetimer import StageTimer
+
+STAGE_TIMING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vision_timing.jsonl")
+HAS_BGR888 = hasattr(QImage, 'Format_BGR888')  # added in Qt 5.14
 
 class VisionThread(QThread):
-    update_frame = pyqtSignal(np.ndarray)
-    update_object_position = pyqtSignal(tuple)
+    update_frame = pyqtSignal(QImage)  # preview, already scaled to preview_size
     update_debug_info = pyqtSignal(str)
+    update_frame_stats = pyqtSignal(int, float)  # frames dropped so far, age of the processed frame (ms)
+    update_stage_stats = pyqtSignal(dict)  # StageTimer.stats(), while stage timing is on
+    corners_stabilized = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.running = False
         self.vision_initialized = False
-        self.cap = None
-        self.corner_history = []
-        self.stable_corners = None
-        self.background_subtractor = None
-        self.last_object_position = None
+        self.camera_source = 0
+        self.grabber = None
+        self.frames_dropped = 0
+        self.preview_size = (640, 480)  # set by the GUI to its label size
+        self.preview_fps = 15  # preview cap, independent of the processing rate
+        self.last_preview_time = 0.0
+        self.stats_interval = 1.0  # s between update_stage_stats emissions
+        self.last_stats_time = 0.0
+        self.pipeline = VisionPipeline(on_debug_info=self.update_debug_info.emit,
+                                       on_stabilized=self.corners_stabilized.emit)
 
     def run(self):
+        # Capture runs on its own thread (LatestFrameGrabber); this loop processes
+        # whichever frame is newest, so a slow frame never builds a backlog
         self.running = True
-        self.init_camera()
+        self.grabber = LatestFrameGrabber(self.camera_source)
         while self.running:
-            if self.cap is None or not self.cap.isOpened():
-                self.init_camera()
-                time.sleep(1)
-                continue
-
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Failed to capture frame")
-                self.init_camera()
-                time.sleep(1)
+            grabbed = self.grabber.read(timeout=0.5)
+            if grabbed is None:
                 continue
+            frame, timestamp, _ = grabbed
 
+            # Debug overlays are only drawn for frames that will be shown
+            preview_due = time.monotonic() - self.last_preview_time >= 1.0 / self.preview_fps
+            processed_frame = frame
             if self.vision_initialized:
-                processed_frame, object_position = self.process_frame(frame)
-                self.update_frame.emit(processed_frame)
-                if object_position is not None:
-                    self.update_object_position.emit(object_position)
-            else:
-                self.update_frame.emit(frame)
-
-            time.sleep(0.03)  # Limit to about 30 FPS
-
-    def init_camera(self):
-        if self.cap is not None:
-            self.cap.release()
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            print("Failed to open camera")
+                processed_frame, _ = self.pipeline.process_frame(frame, draw_debug=preview_due, timestamp=timestamp)
+            self.frames_dropped = self.grabber.dropped
+            if preview_due:
+                # Frame stats refresh at the preview rate, not once per processed frame
+                self.last_preview_time = time.monotonic()
+                self.update_frame.emit(self.preview_image(processed_frame))
+                self.update_frame_stats.emit(self.frames_dropped, (time.monotonic() - timestamp) * 1000)
+
+            timer = self.pipeline.stage_timer
+            if timer is not None and timer.frames and time.monotonic() - self.last_stats_time >= self.stats_interval:
+                self.last_stats_time = time.monotonic()
+                self.update_stage_stats.emit(timer.stats())
+        self.grabber.close()
+
+    def preview_image(self, frame):
+        # Scale to the label here so the GUI thread only wraps the result in a pixmap.
+        # Format_BGR888 (Qt 5.14+) takes OpenCV's channel order as is; copy()
+        # detaches the small image from the numpy buffer before it crosses threads.
+        # Older Qt swaps the channels instead, which also makes a copy.
+        h, w = frame.shape[:2]
+        label_w, label_h = self.preview_size
+        scale = min(label_w / w, label_h / h)
+        if scale != 1:
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interpolation)
+            h, w = frame.shape[:2]
+        if HAS_BGR888:
+            return QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888).copy()
+        return QImage(frame.data, w, h, frame.strides[0], QImage.Format_RGB888).rgbSwapped()
 
     def initialize_vision(self):
         self.vision_initialized = True
-        self.corner_history = []
-        self.stable_corners = None
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=False)
-
-    def process_frame(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        _, box_mask = cv2.threshold(gray, 30, 255, cv2.THRESH_BINARY_INV)
-
-        # Debug: Draw the box_mask on the frame
-        mask_overlay = cv2.cvtColor(box_mask, cv2.COLOR_GRAY2BGR)
-        debug_frame = cv2.addWeighted(frame, 0.7, mask_overlay, 0.3, 0)
-
-        corners = self.find_box_corners(box_mask)
-        if corners is not None and len(corners) == 6:
-            self.corner_history.append(corners)
-            # Debug: Draw detected corners
-            for corner in corners:
-                cv2.circle(debug_frame, tuple(corner.astype(int)), 5, (0, 255, 0), -1)
-            self.update_debug_info.emit(f"Corners detected: {len(corners)}")
-        else:
-            self.update_debug_info.emit("No corners detected")
-
-        if self.stable_corners is None and len(self.corner_history) >= 150:
-            self.stable_corners = self.median_corners(self.corner_history)
-            if self.stable_corners is not None:
-                self.update_debug_info.emit("Stable corners established")
-            else:
-                self.update_debug_info.emit("Failed to establish stable corners")
-
-        if self.stable_corners is not None:
-            # Debug: Draw stable corners
-            for corner in self.stable_corners:
-                cv2.circle(debug_frame, tuple(corner.astype(int)), 7, (255, 0, 0), -1)
-
-            transform_matrix = self.perspective_transform(self.stable_corners, 
-                                                          np.array([175, -5]),
-                                                          np.array([185, -175]),
-                                                          np.array([315, -175]),
-                                                          np.array([305, 0]))
-
-            box_area_mask = np.zeros(gray.shape, dtype=np.uint8)
-            cv2.fillConvexPoly(box_area_mask, self.stable_corners[:4].astype(int), 255)
-
-            masked_frame = cv2.bitwise_and(gray, gray, mask=box_area_mask)
-
-            fg_mask = self.background_subtractor.apply(masked_frame, learningRate=0.0001)
-            
-            fg_mask = cv2.erode(fg_mask, None, iterations=2)
-            fg_mask = cv2.dilate(fg_mask, None, iterations=2)
-
-            _, object_mask = cv2.threshold(fg_mask, 244, 255, cv2.THRESH_BINARY)
-
-            object_contours, _ = cv2.findContours(object_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            min_contour_area = 500
-            large_contours = [cnt for cnt in object_contours if cv2.contourArea(cnt) > min_contour_area]
-            
-            if large_contours:
-                largest_contour = max(large_contours, key=cv2.contourArea)
-                
-                M = cv2.moments(largest_contour)
-                if M["m00"] != 0:
-                    cX = int(M["m10"] / M["m00"])
-                    cY = int(M["m01"] / M["m00"])
-
-                    cv2.drawContours(debug_frame, [largest_contour], 0, (0, 255, 0), 2)
-                    cv2.circle(debug_frame, (cX, cY), 7, (255, 0, 0), -1)
-
-                    object_position = self.calculate_object_position(transform_matrix, (cX, cY))
-                    cv2.putText(debug_frame, f"X: {object_position[1]:.2f}, Y: {object_position[0]:.2f}", (cX, cY - 15),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-                    self.last_object_position = object_position
-                    return debug_frame, object_position
-
-        return debug_frame, None
-
-    def find_box_corners(self, mask):
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-
-            epsilon = 0.02 * cv2.arcLength(largest_contour, True)
-            corners = cv2.approxPolyDP(largest_contour, epsilon, True)
-
-            if 6 <= len(corners) <= 8:
-                return self.sort_corners(corners.reshape(-1, 2))
-            else:
-                self.update_debug_info.emit(f"Invalid number of corners: {len(corners)}")
-        else:
-            self.update_debug_info.emit("No contours found")
-
-        return None
-
-    def sort_corners(self, corners):
-        sorted_corners = corners[np.argsort(corners[:, 1])]
-        top_corners = sorted_corners[:3]
-        bottom_corners = sorted_corners[3:]
-        top_corners = top_corners[np.argsort(top_corners[:, 0])]
-        bottom_corners = bottom_corners[np.argsort(bottom_corners[:, 0])]
-        return np.vstack((top_corners, bottom_corners))[:6]
+        self.pipeline.reset()
 
-    def median_corners(self, corner_history):
-        if len(corner_history) == 0:
-            return None
+    def set_stage_timing(self, enabled):
+        # Times every stage, overlays the timings on the preview and appends them
+        # to STAGE_TIMING_PATH periodically; off, process_frame skips it entirely
+        self.pipeline.timing_overlay = enabled
+        self.pipeline.stage_timer = StageTimer(dump_path=STAGE_TIMING_PATH) if enabled else None
 
-        valid_history = [corners for corners in corner_history if corners is not None and len(corners) == 6]
+class MotionWorker(QThread):
+    # Runs IK off the GUI thread. Only the newest request is kept: a request
+    # submitted while another is pending replaces it, and results of superseded
+    # requests are dropped instead of emitted.
+    motion_solved = pyqtSignal(int, object, float, bool)  # request id, theta, residual (mm), converged
 
-        if len(valid_history) == 0:
-            return None
-
-        median_corners = np.median(valid_history, axis=0).astype(int)
-
-        return median_corners
-
-    def perspective_transform(self, corners, ref_point1, ref_point2, ref_point3, ref_point4):
-        src_points = corners[:4].astype(np.float32)  # Points 1, 2, 3, 4
-        dst_points = np.array([
-            [ref_point1[0], ref_point1[1]],  # Y, X for point 1
-            [ref_point2[0], ref_point2[1]],  # Y, X for point 2
-            [ref_point3[0], ref_point3[1]],  # Y, X for point 3
-            [ref_point4[0], ref_point4[1]]   # Y, X for point 4
-        ], dtype=np.float32)
+    def __init__(self, seed_index=None, parent=None):
+        super().__init__(parent)
+        self.seed_index = seed_index
+        self.running = False
+        self.condition = threading.Condition()
+        self.pending = None
+        self.latest_request = 0
+
+    def submit(self, target_position, previous_theta, restricted=True):
+        with self.condition:
+            self.latest_request += 1
+            self.pending = (self.latest_request, np.array(target_position, dtype=float),
+                            np.array(previous_theta, dtype=float), restricted)
+            self.condition.notify()
+            return self.latest_request
+
+    def cancel(self):
+        # Supersede whatever is pending or in flight without asking for a new move
+        with self.condition:
+            self.latest_request += 1
+            self.pending = None
+
+    def is_current(self, request_id):
+        return request_id == self.latest_request
 
-        matrix = cv2.getPerspectiveTransform(src_points, dst_points)
+    def run(self):
+        self.running = True
+        while self.running:
+            with self.condition:
+                while self.running and self.pending is None:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                request_id, target_position, previous_theta, restricted = self.pending
+                self.pending = None
+
+            theta, residual, converged = solve_ik(target_position, previous_theta, self.seed_index, restricted)
+            if self.is_current(request_id):
+                self.motion_solved.emit(request_id, theta, residual, converged)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.wait()
+
+class QtClock:
+    # PickAndPlace clock backed by single-shot QTimers on the GUI thread
+    def __init__(self, parent):
+        self.parent = parent
+
+    def now(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        timer = QTimer(self.parent)
+        timer.setSingleShot(True)
+        timer.timeout.connect(callback)
+        timer.start(int(delay * 1000))
+        return timer
+
+    def cancel(self, handle):
+        handle.stop()
+
+class TrajectoryThread(QThread):
+    # Plans and streams one straight-line Cartesian path (see trajectory.stream_path)
+    path_finished = pyqtSignal(object, bool)  # last joint angles sent, completed
+
+    def __init__(self, link, waypoints, previous_theta, restricted=True, seed_index=None, parent=None):
+        super().__init__(parent)
+        self.link = link
+        self.waypoints = waypoints
+        self.previous_theta = previous_theta
+        self.last_theta = previous_theta
+        self.restricted = restricted
+        self.seed_index = seed_index
+        self.cancel_event = threading.Event()
 
-        return matrix
+    def run(self):
+        self.last_theta, _, completed = stream_path(self.link, self.waypoints, self.previous_theta,
+                                                    seed_index=self.seed_index, restricted=self.restricted,
+                                                    cancel_event=self.cancel_event)
+        self.path_finished.emit(self.last_theta, completed)
 
-    def calculate_object_position(self, transform_matrix, object_point):
-        object_point = np.array([[[object_point[0], object_point[1]]]], dtype=np.float32)
-        transformed_point = cv2.perspectiveTransform(object_point, transform_matrix)[0][0]
+    def cancel(self):
+        self.cancel_event.set()
+        self.wait()
 
-        y_mm = transformed_point[0]  # Left to right
-        x_mm = transformed_point[1]  # Front to back
+class RoboticArmGUI(QMainWindow):
+    firmware_line = pyqtSignal(str)
 
-        return y_mm, x_mm  # Return (Y, X)
+    # Fallback timeouts (s) for operations that normally end on a completion event
+    COMPLETION_TIMEOUTS = COMPLETION_TIMEOUTS
 
-class RoboticArmGUI(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Robotic Arm Control")
@@ -295,20 +210,14 @@ class RoboticArmGUI(QMainWindow):
 
         self.init_ui()
         self.init_serial()
+        self.init_firmware_events()
         self.init_vision_thread()
+        self.init_seed_index()
+        self.init_reach_map()
+        self.init_motion_worker()
+        self.init_pick_place()
 
         self.previous_theta = np.zeros(6)
-        self.z_offset = self.calculate_z_offset()
-
-        # Joint parameters
-        self.joints = {
-            'J1': {'speed': 6000, 'accel': 8000, 'gear_ratio': 6.4},
-            'J2': {'speed': 12000, 'accel': 8000, 'gear_ratio': 20.0},
-            'J3': {'speed': 14000, 'accel': 8000, 'gear_ratio': 18.0952381},
-            'J4': {'speed': 8000, 'accel': 8000, 'gear_ratio': 4.0},
-            'J5': {'speed': 10000, 'accel': 8000, 'gear_ratio': 4.0},
-            'J6': {'speed': 12000, 'accel': 8000, 'gear_ratio': 10.0}
-        }
 
     def init_ui(self):
         button_layout = QHBoxLayout()
@@ -341,11 +250,19 @@ class RoboticArmGUI(QMainWindow):
         coord_layout.addWidget(self.z_input)
         self.layout.addLayout(coord_layout)
 
+        move_layout = QHBoxLayout()
         self.move_button = QPushButton("Move to Position")
-        self.layout.addWidget(self.move_button)
+        self.straight_line_checkbox = QCheckBox("Straight-line moves")
+        move_layout.addWidget(self.move_button)
+        move_layout.addWidget(self.straight_line_checkbox)
+        self.layout.addLayout(move_layout)
 
+        detect_layout = QHBoxLayout()
         self.detect_button = QPushButton("Detect Object")
-        self.layout.addWidget(self.detect_button)
+        self.pick_all_checkbox = QCheckBox("Pick all queued objects")
+        detect_layout.addWidget(self.detect_button)
+        detect_layout.addWidget(self.pick_all_checkbox)
+        self.layout.addLayout(detect_layout)
 
         self.camera_feed_label = QLabel(self)
         self.camera_feed_label.setAlignment(Qt.AlignCenter)
@@ -355,65 +272,204 @@ class RoboticArmGUI(QMainWindow):
         self.debug_label = QLabel(self)
         self.layout.addWidget(self.debug_label)
 
+        stats_layout = QHBoxLayout()
+        self.frame_stats_label = QLabel(self)
+        self.stage_timing_checkbox = QCheckBox("Stage timing")
+        stats_layout.addWidget(self.frame_stats_label)
+        stats_layout.addWidget(self.stage_timing_checkbox)
+        self.layout.addLayout(stats_layout)
+
+        self.stage_stats_label = QLabel(self)
+        self.layout.addWidget(self.stage_stats_label)
+
         self.homing_button.clicked.connect(self.start_homing)
         self.shutdown_button.clicked.connect(self.start_shutdown)
         self.reset_button.clicked.connect(self.reset_joints)
-        self.move_button.clicked.connect(self.move_to_position)
+        self.move_button.clicked.connect(self.manual_move)
         self.open_button.clicked.connect(self.open_bldc)
         self.close_button.clicked.connect(self.close_bldc)
         self.detect_button.clicked.connect(self.detect_and_move)
         self.init_vision_button.clicked.connect(self.initialize_vision)
+        self.stage_timing_checkbox.toggled.connect(self.toggle_stage_timing)
 
     def init_serial(self):
         try:
-            self.serial_port = serial.Serial("/dev/cu.usbmodem1101", 115200)
+            self.serial_link = SerialLink.open("/dev/cu.usbmodem1101", 115200)
         except serial.SerialException:
             print("Failed to open serial port. Make sure the Arduino is connected.")
 
+    def init_firmware_events(self):
+        # The link's reader thread hands over every firmware line; the signal
+        # queues it onto the GUI thread
+        self.pending_completions = {}
+        self.firmware_line.connect(self.on_firmware_line)
+        if hasattr(self, 'serial_link'):
+            self.serial_link.add_listener(self.firmware_line.emit)
+
+    def on_firmware_line(self, line):
+        event = COMPLETION_LINES.get(line)
+        if event in ('move', 'gripper_closed', 'gripper_opened'):
+            self.pick_place.handle_event(event)
+        elif event is not None:
+            self.complete_operation(event)
+
+    def wait_for_completion(self, event, on_complete):
+        # Run on_complete when the event arrives, or after its fallback timeout
+        timeout = self.COMPLETION_TIMEOUTS[event]
+        if event != 'vision' and not hasattr(self, 'serial_link'):
+            timeout = 0  # nothing connected that could report completion
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self.complete_operation(event, timed_out=True))
+        self.pending_completions[event] = (on_complete, timer, timeout)
+        timer.start(int(timeout * 1000))
+
+    def complete_operation(self, event, timed_out=False):
+        entry = self.pending_completions.pop(event, None)
+        if entry is None:
+            return
+        on_complete, timer, timeout = entry
+        timer.stop()
+        if timed_out and timeout > 0:
+            print(f"Warning: no completion reported for {event} within {timeout} s.")
+        on_complete()
+
+    def init_seed_index(self):
+        # Built offline with `python seedindex.py`; IK still works without it
+        try:
+            self.seed_index = SeedIndex.load()
+        except FileNotFoundError:
+            self.seed_index = None
+            print("No IK seed index found. Run seedindex.py to build one.")
+
+    def init_reach_map(self):
+        # Built offline with `python reachmap.py`; without it every target goes to IK
+        self.reach_map = load_reach_map()
+        if self.reach_map is None:
+            print("No reachability map found. Run reachmap.py to build one.")
+
+    def reachable(self, x, y, z):
+        # False if the reach map rules out the downward tool at this (compensated) target
+        return self.reach_map is None or self.reach_map.reachable((x, y, z))
+
+    def init_motion_worker(self):
+        self.motion_callbacks = {}
+        self.trajectory_thread = None
+        self.motion_worker = MotionWorker(self.seed_index, self)
+        self.motion_worker.motion_solved.connect(self.on_motion_solved)
+        self.motion_worker.start()
+
+    def init_pick_place(self):
+        self.pick_place = PickAndPlace(self.pick_move, self.send_command, QtClock(self),
+                                       on_cycle_complete=self.on_pick_complete)
+        self.current_track = None
+
+    def pick_move(self, target, restricted, on_sent, on_failed):
+        x, y, z = target
+        if restricted:
+            z = compensate_z(x, z)
+        self.request_motion(np.array([x, y, z]), restricted, on_done=on_sent, on_failed=on_failed)
+
+    def on_pick_complete(self, report):
+        if report['failed'] is not None:
+            # Most likely out of reach; drop the object rather than retry it
+            summary = f"Pick failed ({report['failed']})"
+            print(summary)
+            self.update_debug_label(summary)
+            self.finish_pick()
+            return
+        phases = ", ".join(f"{phase} {duration:.2f}s" for phase, duration in report['phases'].items())
+        summary = f"Pick cycle {report['total']:.2f}s ({phases}), {self.pick_place.picks_per_minute():.1f} picks/min"
+        if report['timed_out']:
+            summary += f", timed out: {', '.join(report['timed_out'])}"
+        print(summary)
+        self.update_debug_label(summary)
+        self.finish_pick()
+
+    def finish_pick(self):
+        # The object is in the bowl (or dropped from the queue after a failed
+        # pick); take the next queued one without re-detecting
+        if self.current_track is not None:
+            self.vision_thread.pipeline.tracker.remove(self.current_track.id)
+            self.current_track = None
+        self.vision_thread.pipeline.tracker.paused = False
+        if self.pick_all_checkbox.isChecked():
+            self.pick_next()
+
+    def pick_next(self):
+        # Starts a pick on the oldest reachable queued object; False if there is none
+        tracker = self.vision_thread.pipeline.tracker
+        while True:
+            track = tracker.next_target()
+            if track is None:
+                return False
+            if self.start_pick(track):
+                return True
+
+    def start_pick(self, track):
+        # Objects the downward tool can't get to (pick or lift height) are dropped
+        # from the tracker without solving. Otherwise freeze tracking while the arm
+        # is over the work area, so the gripper isn't tracked as an object and the
+        # objects it hides aren't dropped.
+        x, y = track.position
+        if not all(self.reachable(x, y, compensate_z(x, z)) for z in (PICK_HEIGHT, self.pick_place.lift_height)):
+            print(f"Object #{track.id} at X: {y:.1f}, Y: {x:.1f} is out of reach, skipping it.")
+            self.vision_thread.pipeline.tracker.remove(track.id)
+            return False
+        self.current_track = track
+        self.vision_thread.pipeline.tracker.paused = True
+        self.pick_place.start((x, y, PICK_HEIGHT))
+        return True
+
+    def abort_pick(self):
+        self.pick_place.abort()
+        if self.current_track is not None:
+            self.vision_thread.pipeline.tracker.release(self.current_track.id)
+            self.current_track = None
+        self.vision_thread.pipeline.tracker.paused = False
+
     def init_vision_thread(self):
         self.vision_thread = VisionThread(self)
         self.vision_thread.update_frame.connect(self.update_camera_feed)
-        self.vision_thread.update_object_position.connect(self.update_object_position)
         self.vision_thread.update_debug_info.connect(self.update_debug_label)
+        self.vision_thread.update_frame_stats.connect(self.update_frame_stats)
+        self.vision_thread.update_stage_stats.connect(self.update_stage_stats)
+        self.vision_thread.corners_stabilized.connect(lambda: self.complete_operation('vision'))
         self.vision_thread.start()
 
-    def calculate_z_offset(self):
-        known_points = np.array([
-            [100, 33],
-            [150, 36],
-            [200, 41],
-            [250, 45],
-            [300, 51],
-            [350, 57]
-        ])
-        
-        coeffs = np.polyfit(known_points[:, 0], known_points[:, 1], 2)
-        
-        return coeffs
-
-    def compensate_z(self, x, z):
-        z_compensation = np.polyval(self.z_offset, x)
-        return z + z_compensation - self.z_offset[2]
-
-    def update_camera_feed(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_frame.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qt_image)
-        self.camera_feed_label.setPixmap(pixmap.scaled(self.camera_feed_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
-
-    def update_object_position(self, position):
-        self.last_object_position = position
+    def update_camera_feed(self, image):
+        # VisionThread has already scaled the preview to the label
+        self.camera_feed_label.setPixmap(QPixmap.fromImage(image))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if hasattr(self, 'vision_thread'):
+            self.vision_thread.preview_size = (self.camera_feed_label.width(), self.camera_feed_label.height())
 
     def update_debug_label(self, info):
         self.debug_label.setText(info)
 
+    def update_frame_stats(self, dropped, age_ms):
+        self.frame_stats_label.setText(f"Frame age: {age_ms:.0f} ms | Dropped frames: {dropped}")
+
+    def toggle_stage_timing(self, enabled):
+        self.vision_thread.set_stage_timing(enabled)
+        if not enabled:
+            self.stage_stats_label.clear()
+
+    def update_stage_stats(self, stats):
+        # The three stages with the highest rolling mean
+        stages = {name: stage for name, stage in stats['stages'].items() if name != 'total'}
+        slowest = sorted(stages, key=lambda name: stages[name]['mean_ms'], reverse=True)[:3]
+        total = stats['stages']['total']
+        text = ", ".join(f"{name} {stages[name]['mean_ms']:.1f} ms" for name in slowest)
+        self.stage_stats_label.setText(f"Frame {total['mean_ms']:.1f} ms (p99 {total['p99_ms']:.1f}) | Slowest: {text}")
+
     def start_homing(self):
         self.send_command("H")
         self.homing_button.setEnabled(False)
         self.homing_button.setText("Homing...")
-        QTimer.singleShot(5000, self.finish_homing)
+        self.wait_for_completion('homing', self.finish_homing)
 
     def finish_homing(self):
         self.homing_button.setEnabled(True)
@@ -424,7 +480,7 @@ class RoboticArmGUI(QMainWindow):
         self.send_command("S")
         self.shutdown_button.setEnabled(False)
         self.shutdown_button.setText("Shutting down...")
-        QTimer.singleShot(5000, self.finish_shutdown)
+        self.wait_for_completion('shutdown', self.finish_shutdown)
 
     def finish_shutdown(self):
         self.shutdown_button.setEnabled(True)
@@ -434,84 +490,101 @@ class RoboticArmGUI(QMainWindow):
         self.send_command("R")
         self.reset_button.setEnabled(False)
         self.reset_button.setText("Resetting...")
-        QTimer.singleShot(5000, self.finish_reset)
+        self.wait_for_completion('reset', self.finish_reset)
 
     def finish_reset(self):
         self.reset_button.setEnabled(True)
         self.reset_button.setText("Reset Joints")
         self.previous_theta = np.zeros(6)
 
-    def calculate_max_torque(self, joint):
-        ARM_WEIGHT = 3  # kg
-        GRAVITY = 9.81  # m/s^2
-        if joint in ['J1', 'J2', 'J3']:
-            return ARM_WEIGHT * GRAVITY * 0.7
-        else:
-            return ARM_WEIGHT * GRAVITY * 0.1
-
-    def calculate_time(self, angle, speed, acceleration, gear_ratio, joint):
-        VOLTAGE = 24  # V
-        POWER = 350  # W
-        EFFICIENCY = 0.7
-        MOTOR_TORQUE = 0.5  # N·m
-
-        speed_deg = speed * 1.8 / (gear_ratio * 16)
-        accel_deg = acceleration * 1.8 / (gear_ratio * 16)
-        
-        max_torque = self.calculate_max_torque(joint)
-        
-        available_torque = min(MOTOR_TORQUE * gear_ratio, POWER * EFFICIENCY / speed_deg)
-        torque_factor = min(1, available_torque / max_torque)
-        adjusted_accel = accel_deg * torque_factor
-        
-        time_to_full_speed = speed_deg / adjusted_accel
-        distance_accel = 0.5 * adjusted_accel * time_to_full_speed**2
-        
-        if distance_accel * 2 < abs(angle):
-            full_speed_distance = abs(angle) - 2 * distance_accel
-            time_at_full_speed = full_speed_distance / speed_deg
-            total_time = 2 * time_to_full_speed + time_at_full_speed
-        else:
-            total_time = 2 * math.sqrt(abs(angle) / adjusted_accel)
-        
-        return total_time * 1.4
-
-    def calculate_movement_time(self, joint_angles):
-        longest_time = 0
-        for i, (joint, params) in enumerate(self.joints.items()):
-            angle = joint_angles[i]
-            time = self.calculate_time(angle, params['speed'], params['accel'], params['gear_ratio'], joint)
-            longest_time = max(longest_time, time)
-        return longest_time + 0.5
-
-    def move_to_position(self):
-        try:
-            x = float(self.x_input.text())
-            y = float(self.y_input.text())
-            z = float(self.z_input.text())
-
-            compensated_z = self.compensate_z(x, z)
-
-            target_position = np.array([x, y, compensated_z])
-            
-            joint_angles_rad = inverse_kinematics(target_position, self.previous_theta)
-            self.previous_theta = joint_angles_rad
-            joint_angles_deg = np.degrees(joint_angles_rad)
+    def request_motion(self, target_position, restricted=True, on_done=None, on_failed=None):
+        # Queue an IK solve on the motion worker; on_done(movement_time) runs on the
+        # GUI thread once the move is sent, or on_failed(reason) if IK doesn't
+        # converge and nothing is sent, unless a newer request superseded it
+        self.cancel_motion()
+        if self.straight_line_checkbox.isChecked() and hasattr(self, 'serial_link'):
+            self.start_path(target_position, restricted, on_done, on_failed)
+            return
 
-            inverted_angles = [-angle if i in [0, 2, 3, 4] else angle for i, angle in enumerate(joint_angles_deg)]
+        request_id = self.motion_worker.submit(target_position, self.previous_theta, restricted)
+        self.motion_callbacks = {request_id: (on_done, on_failed)}
+
+    def cancel_motion(self):
+        self.motion_worker.cancel()
+        if self.trajectory_thread is not None:
+            # Wait for the streamer so previous_theta is the last waypoint actually sent
+            self.trajectory_thread.cancel()
+            self.previous_theta = self.trajectory_thread.last_theta
+            self.trajectory_thread = None
+
+    def start_path(self, target_position, restricted=True, on_done=None, on_failed=None):
+        start_position = forward_kinematics(self.previous_theta)[:3, 3]
+        waypoints = line_waypoints(start_position, target_position)
+        thread = TrajectoryThread(self.serial_link, waypoints, self.previous_theta, restricted, self.seed_index, self)
+        thread.path_finished.connect(
+            lambda theta, completed: self.on_path_finished(thread, theta, completed, on_done, on_failed))
+        self.trajectory_thread = thread
+        thread.start()
+
+    def on_path_finished(self, thread, joint_angles_rad, completed, on_done, on_failed):
+        if thread is not self.trajectory_thread:
+            return
+        self.trajectory_thread = None
+        self.previous_theta = joint_angles_rad
+        if completed and on_done is not None:
+            # The arm trails the stream by about one waypoint; allow the usual settle padding
+            on_done(0.5)
+        elif not completed and on_failed is not None:
+            on_failed("path stopped at a waypoint IK could not reach")
+
+    def on_motion_solved(self, request_id, joint_angles_rad, residual, converged):
+        if not self.motion_worker.is_current(request_id):
+            return
+        on_done, on_failed = self.motion_callbacks.pop(request_id, (None, None))
+        if not converged:
+            # Sending it would drive the arm to a pose that can be far off target
+            reason = f"IK did not converge (position residual {residual:.2f} mm), move not sent"
+            print(f"Error: {reason}.")
+            self.update_debug_label(reason)
+            if on_failed is not None:
+                on_failed(reason)
+            return
 
-            inverted_angles[5] = -inverted_angles[0]
+        movement_time = self.send_joint_angles(joint_angles_rad)
+        self.previous_theta = joint_angles_rad
+        if on_done is not None:
+            on_done(movement_time)
 
-            command = "M" + ",".join(f"{angle:.5f}" for angle in inverted_angles)
-            self.send_command(command)
+    def send_joint_angles(self, joint_angles_rad):
+        # Time the move from the pose last sent (previous_theta), not from zero
+        _, start_angles = format_move_command(self.previous_theta)
+        _, inverted_angles = format_move_command(joint_angles_rad)
+        profile, movement_time = plan_move(start_angles, inverted_angles)
+        if hasattr(self, 'serial_link'):
+            self.serial_link.send_move(inverted_angles, wait=False, profile=profile)
 
-            movement_time = self.calculate_movement_time(inverted_angles)
+        return movement_time
 
-            return movement_time
+    def manual_move(self):
+        self.abort_pick()
+        self.move_to_position()
 
+    def move_to_position(self):
+        try:
+            x = float(self.x_input.text())
+            y = float(self.y_input.text())
+            z = float(self.z_input.text())
         except ValueError:
             print("Invalid input. Please enter valid numbers for X, Y, and Z coordinates.")
-            return 0
+            return
+
+        compensated_z = compensate_z(x, z)
+        if not self.reachable(x, y, compensated_z):
+            print("Target is out of reach for the downward tool.")
+            return
+
+        target_position = np.array([x, y, compensated_z])
+        self.request_motion(target_position)
 
     def open_bldc(self):
         self.send_command("OPEN")
@@ -520,81 +593,39 @@ class RoboticArmGUI(QMainWindow):
         self.send_command("CLOSE")
 
     def send_command(self, command):
-        if hasattr(self, 'serial_port'):
-            self.serial_port.write(f"{command}\n".encode())
+        if hasattr(self, 'serial_link'):
+            self.serial_link.send_command(command)
 
     def initialize_vision(self):
         self.vision_thread.initialize_vision()
         self.init_vision_button.setEnabled(False)
         self.init_vision_button.setText("Initializing...")
-        QTimer.singleShot(5000, self.finish_vision_init)
+        self.wait_for_completion('vision', self.finish_vision_init)
 
     def finish_vision_init(self):
         self.init_vision_button.setEnabled(True)
         self.init_vision_button.setText("Re-Initialize Vision")
 
     def detect_and_move(self):
-        if not self.vision_thread.vision_initialized or self.vision_thread.stable_corners is None:
+        if not self.vision_thread.vision_initialized or self.vision_thread.pipeline.stable_corners is None:
             print("Error: Vision not initialized or corners not stabilized yet.")
             return
 
-        if hasattr(self, 'last_object_position'):
-            x, y = self.last_object_position
-            z = 36  # Constant Z value
-            self.move_to_position_and_close(x, y, z)
-        else:
-            print("No object detected.")
-
-    def move_to_position_and_close(self, x, y, z):
-        self.x_input.setText(str(x))
-        self.y_input.setText(str(y))
-        self.z_input.setText(str(z))
-        movement_time = self.move_to_position()
-        
-        # Close the BLDC motor after the calculated movement time
-        QTimer.singleShot(int(movement_time * 1000), self.close_bldc)
-        
-        # Move up to z = 100mm after closing the BLDC
-        QTimer.singleShot(int(movement_time * 1000 + 500), lambda: self.move_up(x, y))
-
-    def move_up(self, x, y):
-        self.x_input.setText(str(x))
-        self.y_input.setText(str(y))
-        self.z_input.setText("100")
-        movement_time = self.move_to_position()
-        
-        # Move to bowl location after ensuring z = 100mm movement is complete
-        QTimer.singleShot(int(movement_time * 1000 + 500), self.move_to_bowl)
-
-    def move_to_bowl(self):
-        bowl_x, bowl_y, bowl_z = 215, -240, 100
-        target_position = np.array([bowl_x, bowl_y, bowl_z])
-        
-        # Use inverse_kinematics_unrestricted for bowl movement
-        joint_angles_rad = inverse_kinematics_unrestricted(target_position, self.previous_theta)
-        self.previous_theta = joint_angles_rad
-        joint_angles_deg = np.degrees(joint_angles_rad)
-
-        inverted_angles = [-angle if i in [0, 2, 3, 4] else angle for i, angle in enumerate(joint_angles_deg)]
-        inverted_angles[5] = -inverted_angles[0]
-
-        command = "M" + ",".join(f"{angle:.5f}" for angle in inverted_angles)
-        self.send_command(command)
+        if self.pick_place.busy:
+            print("Pick in progress.")
+            return
 
-        print(f"Moving to bowl location: ({bowl_x}, {bowl_y}, {bowl_z})")
-        
-        movement_time = self.calculate_movement_time(inverted_angles)
-        
-        # Schedule opening the BLDC after the movement is complete
-        QTimer.singleShot(int(movement_time * 1000 + 500), self.open_bldc)
-        
-        return movement_time
+        if not self.pick_next():
+            print("No object detected.")
 
     def closeEvent(self, event):
+        self.abort_pick()
+        self.cancel_motion()
+        self.motion_worker.stop()
         self.vision_thread.running = False
         self.vision_thread.wait()
-        if hasattr(self, 'serial_port'):
-            self.serial_port.close()
+        if hasattr(self, 'serial_link'):
+            self.serial_link.close()
         event.accept()
 
 if __name__ == "__main__":
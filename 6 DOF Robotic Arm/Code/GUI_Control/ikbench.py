@@ -0,0 +1,146 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from kinematics import solve_ik, forward_kinematics_batch, tool_positions_and_axes, joint_limits
+from pickplace import BOWL_POSITION, PICK_HEIGHT, LIFT_HEIGHT
+from visioncal import REFERENCE_POINTS
+
+# Camera work area in arm coordinates (detect_and_move passes the workspace (Y, X) as x, y)
+PICK_ZONE = np.array([
+    [REFERENCE_POINTS[:, 0].min(), REFERENCE_POINTS[:, 0].max()],
+    [REFERENCE_POINTS[:, 1].min(), REFERENCE_POINTS[:, 1].max()],
+    [PICK_HEIGHT, LIFT_HEIGHT]
+])
+BOWL_JITTER = 10.0  # mm around BOWL_POSITION
+WARM_OFFSET = 10.0  # mm between the warm seed's target and the benchmarked one
+DEFAULT_TARGETS = 200  # per target set
+DEFAULT_SEED = 0
+
+def pick_zone_targets(count, rng):
+    return rng.uniform(PICK_ZONE[:, 0], PICK_ZONE[:, 1], size=(count, 3))
+
+def bowl_targets(count, rng):
+    return np.asarray(BOWL_POSITION, dtype=float) + rng.uniform(-BOWL_JITTER, BOWL_JITTER, size=(count, 3))
+
+def workspace_targets(count, rng):
+    # Reachable by construction: tool positions of random in-limit joint angles,
+    # kept above the table
+    targets = np.empty((0, 3))
+    while len(targets) < count:
+        thetas = rng.uniform(joint_limits[:, 0], joint_limits[:, 1], size=(count, 6))
+        positions = forward_kinematics_batch(thetas)[:, :3, 3]
+        targets = np.vstack([targets, positions[positions[:, 2] > 0]])
+    return targets[:count]
+
+TARGET_SETS = {
+    'pick_zone': pick_zone_targets,
+    'bowl': bowl_targets,
+    'workspace': workspace_targets,
+}
+
+def warm_seeds(targets, restricted, rng, seed_index=None):
+    # A solution for a target WARM_OFFSET away, as left by the previous move of a
+    # pick sequence. Computed outside the timed runs.
+    directions = rng.normal(size=targets.shape)
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    return np.array([solve_ik(target + WARM_OFFSET * direction, None, seed_index, restricted)[0]
+                     for target, direction in zip(targets, directions)])
+
+def run_case(targets, restricted, seeds, seed_index=None):
+    count = len(targets)
+    latencies = np.empty(count)
+    residuals = np.empty(count)
+    converged = np.empty(count, dtype=bool)
+    thetas = np.empty((count, 6))
+    for i, target in enumerate(targets):
+        start = time.perf_counter()
+        thetas[i], residuals[i], converged[i] = solve_ik(target, None if seeds is None else seeds[i],
+                                                         seed_index, restricted)
+        latencies[i] = time.perf_counter() - start
+
+    # Angle between the tool z-axis and straight down
+    _, z_axes = tool_positions_and_axes(thetas)
+    orientation_error = np.degrees(np.arccos(np.clip(-z_axes[:, 2], -1.0, 1.0)))
+    return summarize(latencies * 1000, residuals, orientation_error, converged)
+
+def percentiles(values):
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(values.max())}
+
+def summarize(latencies_ms, residuals, orientation_error, converged):
+    return {
+        'targets': int(len(latencies_ms)),
+        'latency_ms': dict(mean=float(latencies_ms.mean()), **percentiles(latencies_ms)),
+        'residual_mm': percentiles(residuals),
+        'orientation_error_deg': percentiles(orientation_error),
+        'failure_rate': float(1.0 - converged.mean()),
+    }
+
+def run_benchmark(count=DEFAULT_TARGETS, target_sets=tuple(TARGET_SETS), seed=DEFAULT_SEED, seed_index=None,
+                  verbose=False):
+    rng = np.random.default_rng(seed)
+    results = {}
+    for set_name in target_sets:
+        targets = TARGET_SETS[set_name](count, rng)
+        for restricted in (True, False):
+            mode = 'restricted' if restricted else 'unrestricted'
+            cases = (('cold', None), ('warm', warm_seeds(targets, restricted, rng, seed_index)))
+            for start, seeds in cases:
+                key = f"{set_name}/{mode}/{start}"
+                if verbose:
+                    print(f"Running {key}...", file=sys.stderr)
+                results[key] = run_case(targets, restricted, seeds, seed_index)
+    return {
+        'config': {'targets_per_set': count, 'seed': seed, 'seed_index': seed_index is not None,
+                   'warm_offset_mm': WARM_OFFSET},
+        'results': results,
+    }
+
+def compare(report, baseline):
+    # Per-case changes against an earlier report; regressions are a higher failure
+    # rate or a worse p99 residual (latency is machine-dependent, so only reported)
+    lines = []
+    regressed = False
+    for key, result in report['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        failure_delta = result['failure_rate'] - old['failure_rate']
+        residual_delta = result['residual_mm']['p99'] - old['residual_mm']['p99']
+        speedup = old['latency_ms']['p50'] / result['latency_ms']['p50']
+        worse = failure_delta > 0 or residual_delta > 0.1
+        regressed = regressed or worse
+        lines.append(f"{key:40s} p50 x{speedup:5.2f}  failures {failure_delta:+.3f}  "
+                     f"p99 residual {residual_delta:+.3f} mm{'  REGRESSED' if worse else ''}")
+    return lines, regressed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark IK latency and accuracy across the workspace.")
+    parser.add_argument("--targets", type=int, default=DEFAULT_TARGETS, help="targets per set")
+    parser.add_argument("--sets", nargs="+", choices=list(TARGET_SETS), default=list(TARGET_SETS))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="RNG seed for target sampling")
+    parser.add_argument("--seed-index", help="path of a seed index built by seedindex.py")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against; exits 1 on regression")
+    args = parser.parse_args()
+
+    seed_index = None
+    if args.seed_index:
+        from seedindex import SeedIndex
+        seed_index = SeedIndex.load(args.seed_index)
+
+    report = run_benchmark(args.targets, args.sets, args.seed, seed_index, verbose=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            lines, regressed = compare(report, json.load(f))
+        print("\n".join(lines), file=sys.stderr)
+        sys.exit(1 if regressed else 0)
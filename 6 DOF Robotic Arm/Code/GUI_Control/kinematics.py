@@ -0,0 +1,270 @@
+import math
+import numpy as np
+
+# DH parameters [a, alpha, d, theta]
+dhparams = np.array([
+    [23.4200, -np.pi/2, 110.5000, 0],
+    [180.0000, np.pi, 0, -np.pi/2],
+    [-43.5000, np.pi/2, 0, np.pi],
+    [0, -np.pi/2, -176.3500, 0],
+    [0, np.pi/2, 0, 0],
+    [0, np.pi, -125.0750, np.pi]
+])
+
+# Joint limits in radians
+joint_limits = np.array([
+    [-123.046875, 123.046875],
+    [-55.0088, 86.625],
+    [-72.134, 107.8675],
+    [-105.46975, 105.46975],
+    [-90, 90],
+    [-360, 360]
+]) * np.pi / 180  # Convert to radians
+
+joint_weights = np.array([1.0, 1.1, 0.9, 1.4, 0.8, 1.0])
+
+# Constant per-link terms of the DH chain, computed once for the batched FK
+dh_a = dhparams[:, 0]
+dh_d = dhparams[:, 2]
+dh_theta_offset = dhparams[:, 3]
+dh_cos_alpha = np.cos(dhparams[:, 1])
+dh_sin_alpha = np.sin(dhparams[:, 1])
+
+def dh_matrix(a, alpha, d, theta):
+    return np.array([
+        [np.cos(theta), -np.sin(theta)*np.cos(alpha), np.sin(theta)*np.sin(alpha), a*np.cos(theta)],
+        [np.sin(theta), np.cos(theta)*np.cos(alpha), -np.cos(theta)*np.sin(alpha), a*np.sin(theta)],
+        [0, np.sin(alpha), np.cos(alpha), d],
+        [0, 0, 0, 1]
+    ])
+
+def dh_matrices(thetas):
+    # (N, 6) joint angles -> (N, 6, 4, 4) link transforms
+    thetas = np.atleast_2d(thetas) + dh_theta_offset
+    ct = np.cos(thetas)
+    st = np.sin(thetas)
+
+    A = np.zeros(thetas.shape + (4, 4))
+    A[..., 0, 0] = ct
+    A[..., 0, 1] = -st * dh_cos_alpha
+    A[..., 0, 2] = st * dh_sin_alpha
+    A[..., 0, 3] = dh_a * ct
+    A[..., 1, 0] = st
+    A[..., 1, 1] = ct * dh_cos_alpha
+    A[..., 1, 2] = -ct * dh_sin_alpha
+    A[..., 1, 3] = dh_a * st
+    A[..., 2, 1] = dh_sin_alpha
+    A[..., 2, 2] = dh_cos_alpha
+    A[..., 2, 3] = dh_d
+    A[..., 3, 3] = 1
+    return A
+
+def forward_kinematics(theta):
+    T = np.eye(4)
+    for i in range(6):
+        a, alpha, d, theta_offset = dhparams[i]
+        T = T @ dh_matrix(a, alpha, d, theta[i] + theta_offset)
+    return T
+
+def forward_kinematics_batch(thetas):
+    # (N, 6) joint angles -> (N, 4, 4) end-effector poses in one vectorized pass
+    A = dh_matrices(thetas)
+    T = A[:, 0]
+    for i in range(1, 6):
+        T = T @ A[:, i]
+    return T
+
+def tool_positions_and_axes(thetas):
+    # (N, 6) joint angles -> (N, 3) tool positions and (N, 3) tool z-axes
+    T = forward_kinematics_batch(thetas)
+    return T[:, :3, 3], T[:, :3, 2]
+
+def objective_function(theta, target_position, previous_theta):
+    T = forward_kinematics(theta)
+    current_position = T[:3, 3]
+    current_orientation = T[:3, :3]
+    
+    position_error = np.sum((current_position - target_position)**2)
+    
+    desired_z_axis = np.array([0, 0, -1])  # Pointing downward
+    current_z_axis = current_orientation[:, 2]
+    orientation_error = np.sum((current_z_axis - desired_z_axis)**2)
+    
+    joint_change_penalty = np.sum(joint_weights * (theta - previous_theta)**2)
+    
+    total_error = position_error + 10 * orientation_error + 0.1 * joint_change_penalty
+    return total_error
+
+def joint_frames(theta):
+    # Cumulative transforms base -> frame i for i = 0..6, shape (7, 4, 4)
+    A = dh_matrices(theta)[0]
+    frames = np.empty((7, 4, 4))
+    frames[0] = np.eye(4)
+    for i in range(6):
+        frames[i + 1] = frames[i] @ A[i]
+    return frames
+
+def tool_jacobian(theta):
+    # Tool position and z-axis with their (3, 6) Jacobians. Joint i turns about
+    # z of frame i-1, so dp/dθi = z × (p - o) and dz/dθi = z × z_ee.
+    frames = joint_frames(theta)
+    axes = frames[:6, :3, 2]
+    origins = frames[:6, :3, 3]
+    position = frames[6, :3, 3]
+    z_axis = frames[6, :3, 2]
+    J_position = np.cross(axes, position - origins).T
+    J_z_axis = np.cross(axes, z_axis).T
+    return position, z_axis, J_position, J_z_axis
+
+def objective_and_gradient(theta, target_position, previous_theta, orientation_weight=10):
+    # Same cost as objective_function, plus its exact gradient for L-BFGS-B (jac=True)
+    position, z_axis, J_position, J_z_axis = tool_jacobian(theta)
+
+    position_residual = position - target_position
+    z_residual = z_axis - np.array([0, 0, -1])
+    joint_change = theta - previous_theta
+
+    total_error = (np.sum(position_residual**2)
+                   + orientation_weight * np.sum(z_residual**2)
+                   + 0.1 * np.sum(joint_weights * joint_change**2))
+    gradient = (2 * J_position.T @ position_residual
+                + 2 * orientation_weight * J_z_axis.T @ z_residual
+                + 0.2 * joint_weights * joint_change)
+    return total_error, gradient
+
+def wrap_angle(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+def within_joint_limits(theta):
+    return bool(np.all((theta >= joint_limits[:, 0] - 1e-9) & (theta <= joint_limits[:, 1] + 1e-9)))
+
+def link_rotation(i, theta):
+    # Rotation block of dh_matrix for link i, without the 4x4 bookkeeping
+    ct = math.cos(theta + dh_theta_offset[i])
+    st = math.sin(theta + dh_theta_offset[i])
+    ca, sa = dh_cos_alpha[i], dh_sin_alpha[i]
+    return np.array([
+        [ct, -st*ca, st*sa],
+        [st, ct*ca, -ct*sa],
+        [0, sa, ca]
+    ])
+
+def analytic_ik_solutions(target_position, tool_z_axis=(0, 0, -1), previous_theta=None):
+    # Closed-form IK for the spherical wrist (joints 4-6 have a = 0, axes meet at
+    # the wrist centre). Returns every branch inside joint_limits, shape (K, 6).
+    # Only the tool z-axis is constrained, so joint 6 stays at previous_theta.
+    if previous_theta is None:
+        previous_theta = np.zeros(6)
+    a1, d1 = dh_a[0], dh_d[0]
+    a2 = dh_a[1]
+    a3, d4 = dh_a[2], dh_d[3]
+    d6 = dh_d[5]
+    L3 = math.hypot(a3, d4)
+    beta = math.atan2(d4, a3)
+
+    tool_z_axis = np.asarray(tool_z_axis, dtype=float)
+    tool_z_axis = tool_z_axis / np.linalg.norm(tool_z_axis)
+    # Link 6 flips z (alpha = pi), so the tool point sits d6 along -z6 from the wrist centre
+    wx, wy, wz = np.asarray(target_position, dtype=float) + d6 * tool_z_axis
+
+    solutions = []
+    base_angle = math.atan2(wy, wx)
+    for theta1 in (base_angle, base_angle + math.pi):
+        c1, s1 = math.cos(theta1), math.sin(theta1)
+        R1 = link_rotation(0, theta1)
+        # Shoulder plane coordinates of the wrist centre, measured from frame 1
+        u = c1 * wx + s1 * wy - a1
+        v = d1 - wz
+        cos_psi = (u * u + v * v - a2 * a2 - L3 * L3) / (2 * a2 * L3)
+        if abs(cos_psi) > 1:
+            continue
+        psi_up = math.acos(cos_psi)
+        for psi in ((psi_up, -psi_up) if psi_up > 0 else (psi_up,)):
+            phi2 = math.atan2(v, u) - math.atan2(L3 * math.sin(psi), a2 + L3 * math.cos(psi))
+            phi3 = beta - psi
+            theta2 = phi2 - dh_theta_offset[1]
+            theta3 = phi3 - dh_theta_offset[2]
+
+            R3 = R1 @ link_rotation(1, theta2) @ link_rotation(2, theta3)
+            # z5 = -z6; express it in frame 3 where z5 = [c4 s5, s4 s5, c5]
+            w = R3.T @ -tool_z_axis
+            theta5_mag = math.acos(max(-1.0, min(1.0, w[2])))
+            for theta5 in (theta5_mag, -theta5_mag):
+                if abs(math.sin(theta5)) < 1e-9:
+                    if theta5 < 0:
+                        continue
+                    theta4 = previous_theta[3]  # wrist singularity, joint 4 is free
+                elif theta5 > 0:
+                    theta4 = math.atan2(w[1], w[0])
+                else:
+                    theta4 = math.atan2(-w[1], -w[0])
+                theta = wrap_angle(np.array([theta1, theta2, theta3, theta4, theta5, 0.0]))
+                theta[5] = previous_theta[5]
+                if within_joint_limits(theta):
+                    solutions.append(theta)
+
+    return np.array(solutions).reshape(-1, 6)
+
+def analytic_inverse_kinematics(target_position, previous_theta=None, tool_z_axis=(0, 0, -1)):
+    # Branch closest to previous_theta by the joint_weights metric, or None if unreachable
+    if previous_theta is None:
+        previous_theta = np.zeros(6)
+    solutions = analytic_ik_solutions(target_position, tool_z_axis, previous_theta)
+    if len(solutions) == 0:
+        return None
+    cost = np.sum(joint_weights * (solutions - previous_theta)**2, axis=1)
+    return solutions[np.argmin(cost)]
+
+def optimizer_seed(target_position, previous_theta, seed_index, orientation_weight=10):
+    # Start from whichever of previous_theta and the stored workspace seed scores lower
+    if seed_index is None:
+        return previous_theta
+    stored = seed_index.lookup(target_position)
+    if (objective_and_gradient(stored, target_position, previous_theta, orientation_weight)[0]
+            < objective_and_gradient(previous_theta, target_position, previous_theta, orientation_weight)[0]):
+        return stored
+    return previous_theta
+
+# Acceptance thresholds for a solve; the orientation one matches the GUI's warning check
+POSITION_TOLERANCE = 1.0  # mm
+ORIENTATION_TOLERANCE = 0.1
+
+def solve_ik(target_position, previous_theta=None, seed_index=None, restricted=True):
+    # Returns (theta, position residual in mm, converged). restricted=True asks for
+    # the downward tool; False is the position-only solve used for the bowl.
+    if previous_theta is None:
+        previous_theta = np.zeros(6)
+    target_position = np.asarray(target_position, dtype=float)
+
+    theta = analytic_inverse_kinematics(target_position, previous_theta) if restricted else None
+    if theta is None:
+        # Analytic path rejected the target (out of reach or limits), fall back to the
+        # optimizer. SciPy is imported here, not at load: it is most of the import time.
+        from scipy.optimize import minimize
+        orientation_weight = 10 if restricted else 0
+        result = minimize(
+            objective_and_gradient,
+            optimizer_seed(target_position, previous_theta, seed_index, orientation_weight),
+            args=(target_position, previous_theta, orientation_weight),
+            method='L-BFGS-B',
+            jac=True,
+            bounds=joint_limits
+        )
+        theta = result.x
+        success = result.success
+    else:
+        success = True
+
+    T = forward_kinematics(theta)
+    residual = np.linalg.norm(T[:3, 3] - target_position)
+    converged = success and residual < POSITION_TOLERANCE
+    if restricted:
+        converged = converged and np.sum((T[:3, 2] - np.array([0, 0, -1]))**2) < ORIENTATION_TOLERANCE
+    return theta, residual, bool(converged)
+
+def inverse_kinematics(target_position, previous_theta=None, seed_index=None):
+    return solve_ik(target_position, previous_theta, seed_index)[0]
+
+def inverse_kinematics_unrestricted(target_position, previous_theta=None, seed_index=None):
+    # Position and joint-change terms only, no tool orientation
+    return solve_ik(target_position, previous_theta, seed_index, restricted=False)[0]
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Stepper drive constants (see motorcst.h)
+STEP_ANGLE = 1.8  # degrees per full step
+MICROSTEPPING = 16
+
+# Speed (steps/s), acceleration (steps/s^2) and gear ratio per joint, as
+# fullcntl.ino leaves them configured after homing. J5 ends on moveToAngleJ5's
+# 3000 / 3000, not the 10000 / 8000 it is briefly set to.
+JOINTS = {
+    'J1': {'speed': 6000, 'accel': 8000, 'gear_ratio': 6.4},
+    'J2': {'speed': 12000, 'accel': 8000, 'gear_ratio': 20.0},
+    'J3': {'speed': 14000, 'accel': 8000, 'gear_ratio': 18.0952381},
+    'J4': {'speed': 8000, 'accel': 8000, 'gear_ratio': 4.0},
+    'J5': {'speed': 3000, 'accel': 3000, 'gear_ratio': 4.0},
+    'J6': {'speed': 12000, 'accel': 8000, 'gear_ratio': 10.0}
+}
+SPEEDS = np.array([params['speed'] for params in JOINTS.values()], dtype=float)
+ACCELS = np.array([params['accel'] for params in JOINTS.values()], dtype=float)
+GEAR_RATIOS = np.array([params['gear_ratio'] for params in JOINTS.values()])
+
+# Scheduling margin on top of the model, replacing the old 1.4x + 0.5 s padding
+TIMING_MARGIN = 1.05
+TIMING_PADDING = 0.1  # s
+
+def angle_to_steps(angles_deg, gear_ratios=GEAR_RATIOS):
+    # Matches the firmware's calculateStepsJn: float product truncated to int
+    steps_per_degree = MICROSTEPPING / STEP_ANGLE
+    return np.trunc(np.asarray(angles_deg, dtype=float) * steps_per_degree * gear_ratios)
+
+def profile_time(steps, speed, accel):
+    # AccelStepper trapezoidal profile from rest to rest. The ramp reaches full
+    # speed after speed^2 / (2 accel) steps; shorter moves are triangular.
+    steps = np.abs(steps)
+    ramp_steps = speed**2 / (2 * accel)
+    trapezoid = steps / speed + speed / accel
+    triangle = 2 * np.sqrt(steps / accel)
+    return np.where(steps >= 2 * ramp_steps, trapezoid, triangle)
+
+def joint_move_times(delta_deg, speeds=SPEEDS, accels=ACCELS, gear_ratios=GEAR_RATIOS):
+    # Per-joint times (s) for (..., 6) arrays of joint deltas in firmware degrees,
+    # so millions of moves can be timed in one call
+    return profile_time(angle_to_steps(delta_deg, gear_ratios), speeds, accels)
+
+def move_time(delta_deg, speeds=SPEEDS, accels=ACCELS, gear_ratios=GEAR_RATIOS):
+    # Whole-move time: the joints run concurrently, so the slowest one decides
+    return np.max(joint_move_times(delta_deg, speeds, accels, gear_ratios), axis=-1)
+
+def scheduled_move_time(delta_deg, **kwargs):
+    return move_time(delta_deg, **kwargs) * TIMING_MARGIN + TIMING_PADDING
+
+def accelstepper_time(steps, speed, accel):
+    # Step-by-step replay of AccelStepper's computeNewSpeed (Austin's ramp with
+    # the 0.676 first-step correction), for validating profile_time
+    steps = int(abs(steps))
+    c0 = 0.676 * np.sqrt(2.0 / accel) * 1e6
+    cmin = 1e6 / speed
+    n = 0
+    cn = c0
+    current_speed = 0.0
+    elapsed = 0.0
+    for remaining in range(steps, 1, -1):
+        steps_to_stop = int(current_speed**2 / (2.0 * accel))
+        if n > 0 and steps_to_stop >= remaining:
+            n = -steps_to_stop
+        if n == 0:
+            cn = c0
+        else:
+            cn = max(cn - 2.0 * cn / (4.0 * n + 1), cmin)
+        n += 1
+        current_speed = 1e6 / cn
+        elapsed += cn
+    return elapsed / 1e6
+
+def synchronized_profile(delta_deg, speeds=SPEEDS, accels=ACCELS, gear_ratios=GEAR_RATIOS):
+    # Per-joint speed and acceleration (steps/s, steps/s^2, rounded up to whole
+    # numbers for the M command) that make every joint arrive together. Each joint
+    # runs its step count times one shared unit-distance profile, whose speed and
+    # acceleration are the tightest limit / steps ratio over the moving joints.
+    # Returns (speeds, accels, move time); joints that don't move keep their limits.
+    steps = np.abs(angle_to_steps(delta_deg, gear_ratios))
+    moving = steps > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unit_speed = np.min(np.where(moving, speeds / steps, np.inf), axis=-1, keepdims=True)
+        unit_accel = np.min(np.where(moving, accels / steps, np.inf), axis=-1, keepdims=True)
+        # Short moves never reach full speed; send the triangle's apex instead
+        unit_speed = np.minimum(unit_speed, np.sqrt(unit_accel))
+        duration = np.where(moving.any(axis=-1), profile_time(1.0, unit_speed, unit_accel)[..., 0], 0.0)
+        joint_speeds = np.where(moving, np.minimum(np.ceil(steps * unit_speed), speeds), speeds)
+        joint_accels = np.where(moving, np.minimum(np.ceil(steps * unit_accel), accels), accels)
+    return joint_speeds, joint_accels, duration
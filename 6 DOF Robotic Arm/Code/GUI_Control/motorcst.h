@@ -41,6 +41,11 @@ const float homeAngleJ6 = 0; // Angle at home position for J6
 const float targetAngleJ6 = 100; // Target angle after homing for J6
 const float backOffAngleJ6 = 5.0; // Back off angle in degrees for J6
 
+// Default M-move profile per joint (J1..J6), as the homing sequence leaves it.
+// A synchronized M command overrides these for that move only.
+const float defaultMoveSpeed[6] = {6000, 12000, 14000, 8000, 3000, 12000}; // steps per second
+const float defaultMoveAccel[6] = {8000, 8000, 8000, 8000, 3000, 8000}; // steps per second squared
+
 const float NORMAL_VOLTAGE = 20.0;  // Normal operating voltage
 const float LOW_VOLTAGE = 10.0;     // Low voltage for holding position
 
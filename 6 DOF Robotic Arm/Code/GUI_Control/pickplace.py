@@ -0,0 +1,208 @@
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+
+# Where picked parts are dropped, and the heights used around a pick (mm)
+BOWL_POSITION = (215, -240, 100)
+PICK_HEIGHT = 36
+LIFT_HEIGHT = 100
+GRIP_SETTLE_TIME = 0.5  # s between the gripper reporting closed and lifting
+
+PHASES = ['approach', 'grip', 'lift', 'transfer', 'release']
+
+class ManualClock:
+    # Simulated time for running pick cycles faster than real time. Callbacks
+    # fire in deadline order as advance() moves the clock forward.
+    def __init__(self):
+        self.time = 0.0
+        self.queue = []
+        self.counter = itertools.count()
+
+    def now(self):
+        return self.time
+
+    def call_later(self, delay, callback):
+        handle = [self.time + delay, next(self.counter), callback]
+        heapq.heappush(self.queue, handle)
+        return handle
+
+    def cancel(self, handle):
+        handle[2] = None
+
+    def advance(self, seconds):
+        end = self.time + seconds
+        while self.queue and self.queue[0][0] <= end:
+            deadline, _, callback = heapq.heappop(self.queue)
+            self.time = deadline
+            if callback is not None:
+                callback()
+        self.time = end
+
+class ThreadClock:
+    # Wall-clock timers for headless use. Callbacks run on timer threads.
+    def now(self):
+        return time.monotonic()
+
+    def call_later(self, delay, callback):
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def cancel(self, handle):
+        handle.cancel()
+
+class PickAndPlace:
+    # Pick-and-place sequence: approach -> grip -> lift -> transfer -> release.
+    # Each phase ends on an arm event ('move', 'gripper_closed', 'gripper_opened',
+    # fed in through handle_event); the motion-time estimate is only a fallback
+    # timeout in case the event never arrives.
+    #
+    # The arm side is two callables so the same machine drives the GUI, the
+    # simulator and tests:
+    #   move(target, restricted, on_sent, on_failed)
+    #                                     - start a move; on_sent(estimated_time)
+    #                                       is called once the command is out, or
+    #                                       on_failed(reason) if it can't be sent
+    #   gripper(command)                  - send "OPEN" or "CLOSE"
+    # clock provides now(), call_later(delay, callback) and cancel(handle).
+    #
+    # Every finished cycle produces a report with per-phase durations, which is
+    # kept in history and passed to on_cycle_complete. A cycle whose move fails
+    # ends early with the reason in report['failed'] (None otherwise); it is
+    # passed on but not kept, so picks/min counts only completed picks.
+    def __init__(self, move, gripper, clock, on_cycle_complete=None, fallback_padding=1.0,
+                 gripper_timeout=2.0, bowl_position=BOWL_POSITION, lift_height=LIFT_HEIGHT):
+        self.move = move
+        self.gripper = gripper
+        self.clock = clock
+        self.on_cycle_complete = on_cycle_complete
+        self.fallback_padding = fallback_padding
+        self.gripper_timeout = gripper_timeout
+        self.bowl_position = bowl_position
+        self.lift_height = lift_height
+        self.phase = 'idle'
+        self.phase_start = 0.0
+        self.waiting_for = None
+        self.timer = None
+        self.cycle = None
+        self.history = deque(maxlen=100)
+
+    @property
+    def busy(self):
+        return self.phase != 'idle'
+
+    def start(self, target):
+        if self.busy:
+            return False
+        self.cycle = {'target': tuple(target), 'start': self.clock.now(), 'phases': {}, 'timed_out': [],
+                      'failed': None}
+        self.enter('approach')
+        self.send_move(tuple(target), True)
+        return True
+
+    def abort(self):
+        self.cancel_timer()
+        self.phase = 'idle'
+        self.waiting_for = None
+        self.cycle = None
+
+    def handle_event(self, event):
+        if self.waiting_for is not None and event == self.waiting_for:
+            self.cancel_timer()
+            self.advance()
+
+    def picks_per_minute(self):
+        if not self.history:
+            return 0.0
+        return 60.0 * len(self.history) / sum(report['total'] for report in self.history)
+
+    def enter(self, phase):
+        now = self.clock.now()
+        if self.phase in PHASES:
+            self.cycle['phases'][self.phase] = now - self.phase_start
+        self.phase = phase
+        self.phase_start = now
+        self.waiting_for = None
+
+    def send_move(self, target, restricted):
+        cycle = self.cycle
+
+        def on_sent(estimated_time):
+            if self.cycle is cycle:
+                self.wait_for('move', estimated_time + self.fallback_padding)
+
+        def on_failed(reason):
+            if self.cycle is cycle:
+                self.fail(reason)
+
+        self.move(target, restricted, on_sent, on_failed)
+
+    def fail(self, reason):
+        # Ends the current cycle where it is; the arm is left in place
+        if not self.busy:
+            return
+        self.cancel_timer()
+        self.cycle['failed'] = f"{self.phase}: {reason}"
+        self.finish()
+
+    def wait_for(self, event, timeout):
+        self.waiting_for = event
+        self.schedule(timeout, self.on_timeout)
+
+    def schedule(self, delay, callback):
+        cycle, phase = self.cycle, self.phase
+
+        def fire():
+            if self.cycle is cycle and self.phase == phase:
+                self.timer = None
+                callback()
+
+        self.cancel_timer()
+        self.timer = self.clock.call_later(delay, fire)
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.clock.cancel(self.timer)
+            self.timer = None
+
+    def on_timeout(self):
+        self.cycle['timed_out'].append(self.phase)
+        self.advance()
+
+    def advance(self):
+        # Current phase's wait is over, by event or by timeout
+        self.waiting_for = None
+        if self.phase == 'approach':
+            self.enter('grip')
+            self.gripper("CLOSE")
+            self.wait_for('gripper_closed', self.gripper_timeout)
+        elif self.phase == 'grip':
+            # Closed; give the jaws a moment to bite before lifting
+            self.schedule(GRIP_SETTLE_TIME, self.lift)
+        elif self.phase == 'lift':
+            self.enter('transfer')
+            self.send_move(self.bowl_position, False)
+        elif self.phase == 'transfer':
+            self.enter('release')
+            self.gripper("OPEN")
+            self.wait_for('gripper_opened', self.gripper_timeout)
+        elif self.phase == 'release':
+            self.finish()
+
+    def lift(self):
+        x, y, _ = self.cycle['target']
+        self.enter('lift')
+        self.send_move((x, y, self.lift_height), True)
+
+    def finish(self):
+        self.enter('idle')
+        report = self.cycle
+        report['total'] = self.clock.now() - report['start']
+        self.cycle = None
+        if report['failed'] is None:
+            self.history.append(report)
+        if self.on_cycle_complete is not None:
+            self.on_cycle_complete(report)
@@ -0,0 +1,104 @@
+import os
+import math
+import argparse
+import numpy as np
+from seedindex import DEFAULT_BOUNDS, DEFAULT_SPACING
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reach_map.npz")
+
+# Status of a grid cell (the cube between 8 grid nodes) for the downward tool
+UNREACHABLE = 0  # no corner has a solution: reject without solving
+PARTIAL = 1  # some corners do: the cell straddles the edge of reach, let IK decide
+REACHABLE = 2  # every corner does
+
+class UnreachableTarget(ValueError):
+    pass
+
+class ReachabilityMap:
+    # Regular grid of workspace nodes, each marked reachable if the analytic IK
+    # has a downward-tool solution inside the joint limits, with a manipulability
+    # index (Yoshikawa, sqrt(det(J Jᵀ)) of the position Jacobian, normalized to
+    # the best node). Lookups index the precomputed cell status directly, O(1).
+    def __init__(self, reachable, manipulability, origin, spacing):
+        self.nodes = np.asarray(reachable, dtype=bool)
+        self.manipulability = np.asarray(manipulability, dtype=np.float16)
+        self.origin = np.asarray(origin, dtype=float)
+        self.spacing = float(spacing)
+        self.shape = np.array(self.nodes.shape)
+        corners = [self.nodes[i:self.shape[0] - 1 + i, j:self.shape[1] - 1 + j, k:self.shape[2] - 1 + k]
+                   for i in (0, 1) for j in (0, 1) for k in (0, 1)]
+        reachable_corners = np.sum(corners, axis=0)
+        self.cells = np.where(reachable_corners == 8, REACHABLE,
+                              np.where(reachable_corners > 0, PARTIAL, UNREACHABLE)).astype(np.uint8)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with np.load(path) as data:
+            return cls(data['reachable'], data['manipulability'], data['origin'], float(data['spacing']))
+
+    def save(self, path=DEFAULT_PATH):
+        np.savez_compressed(path, reachable=self.nodes, manipulability=self.manipulability,
+                            origin=self.origin, spacing=np.array(self.spacing))
+
+    def status(self, target_position):
+        # Cell status at a point; anything outside the grid is UNREACHABLE. Plain
+        # float maths: numpy's per-call overhead would be most of the lookup.
+        index = tuple(math.floor((float(value) - origin) / self.spacing)
+                      for value, origin in zip(target_position, self.origin))
+        if not all(0 <= i < n for i, n in zip(index, self.cells.shape)):
+            return UNREACHABLE
+        return int(self.cells[index])
+
+    def reachable(self, target_position):
+        # False only where the downward tool certainly can't get to; edge cells pass
+        return self.status(target_position) != UNREACHABLE
+
+    def manipulability_at(self, target_position):
+        # Index at the nearest node, 0 where unreachable
+        index = np.rint((np.asarray(target_position, dtype=float) - self.origin) / self.spacing).astype(int)
+        return float(self.manipulability[tuple(np.clip(index, 0, self.shape - 1))])
+
+def load_reach_map(path=DEFAULT_PATH):
+    # Built offline with `python reachmap.py`; without it nothing is rejected early
+    try:
+        return ReachabilityMap.load(path)
+    except FileNotFoundError:
+        return None
+
+def build_reachability_map(bounds=DEFAULT_BOUNDS, spacing=DEFAULT_SPACING, verbose=False):
+    from kinematics import analytic_inverse_kinematics, tool_jacobian
+
+    axes = [np.arange(lo, hi + spacing / 2, spacing) for lo, hi in bounds]
+    shape = tuple(len(axis) for axis in axes)
+    reachable = np.zeros(shape, dtype=bool)
+    manipulability = np.zeros(shape)
+
+    for i, x in enumerate(axes[0]):
+        for j, y in enumerate(axes[1]):
+            for k, z in enumerate(axes[2]):
+                theta = analytic_inverse_kinematics(np.array([x, y, z]))
+                if theta is not None:
+                    J_position = tool_jacobian(theta)[2]
+                    reachable[i, j, k] = True
+                    manipulability[i, j, k] = np.sqrt(max(np.linalg.det(J_position @ J_position.T), 0.0))
+        if verbose:
+            print(f"x = {x:.0f} mm ({i + 1}/{shape[0]})")
+
+    if manipulability.max() > 0:
+        manipulability /= manipulability.max()
+    reach_map = ReachabilityMap(reachable, manipulability, bounds[:, 0], spacing)
+    if verbose:
+        counts = np.bincount(reach_map.cells.ravel(), minlength=3)
+        print(f"{reachable.sum()} of {reachable.size} nodes reachable; cells: {counts[REACHABLE]} reachable, "
+              f"{counts[PARTIAL]} partial, {counts[UNREACHABLE]} unreachable")
+    return reach_map
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the downward-tool reachability map")
+    parser.add_argument("--out", default=DEFAULT_PATH, help="output .npz path")
+    parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING, help="grid spacing in mm")
+    args = parser.parse_args()
+
+    reach_map = build_reachability_map(spacing=args.spacing, verbose=True)
+    reach_map.save(args.out)
+    print(f"Saved {args.out} ({os.path.getsize(args.out) / 1e3:.0f} kB)")
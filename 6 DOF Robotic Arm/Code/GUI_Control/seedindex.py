@@ -0,0 +1,98 @@
+import os
+import json
+import argparse
+import numpy as np
+from kinematics import analytic_inverse_kinematics
+
+# Default grid over the arm's reach, in mm
+DEFAULT_BOUNDS = np.array([
+    [-400, 400],
+    [-400, 400],
+    [-100, 450]
+])
+DEFAULT_SPACING = 10.0
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ik_seeds")
+
+class SeedIndex:
+    # Regular grid of known-good joint solutions. The seed table is a plain .npy
+    # so it can be memory-mapped; grid geometry lives in a small .json sidecar.
+    def __init__(self, seeds, origin, spacing):
+        self.seeds = seeds
+        self.origin = np.asarray(origin, dtype=float)
+        self.spacing = float(spacing)
+        self.shape = np.array(seeds.shape[:3])
+        self.path = None
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        seeds = np.load(path + ".npy", mmap_mode='r')
+        index = cls(seeds, meta['origin'], meta['spacing'])
+        index.path = path
+        return index
+
+    def __getstate__(self):
+        # A loaded index pickles as its path, so worker processes re-map the file
+        # instead of receiving a copy of the table
+        if self.path is not None:
+            return {'path': self.path}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if 'seeds' not in state:
+            state = SeedIndex.load(state['path']).__dict__
+        self.__dict__.update(state)
+
+    def save(self, path=DEFAULT_PATH):
+        np.save(path + ".npy", np.ascontiguousarray(self.seeds, dtype=np.float32))
+        with open(path + ".json", "w") as f:
+            json.dump({'origin': self.origin.tolist(), 'spacing': self.spacing,
+                       'shape': self.shape.tolist()}, f)
+
+    def cell(self, target_position):
+        index = np.rint((np.asarray(target_position, dtype=float) - self.origin) / self.spacing).astype(int)
+        return tuple(np.clip(index, 0, self.shape - 1))
+
+    def lookup(self, target_position):
+        return np.array(self.seeds[self.cell(target_position)], dtype=float)
+
+def build_seed_index(bounds=DEFAULT_BOUNDS, spacing=DEFAULT_SPACING, verbose=False):
+    from scipy.spatial import cKDTree
+
+    axes = [np.arange(lo, hi + spacing / 2, spacing) for lo, hi in bounds]
+    shape = tuple(len(axis) for axis in axes)
+    seeds = np.full(shape + (6,), np.nan)
+
+    for i, x in enumerate(axes[0]):
+        for j, y in enumerate(axes[1]):
+            for k, z in enumerate(axes[2]):
+                theta = analytic_inverse_kinematics(np.array([x, y, z]))
+                if theta is not None:
+                    seeds[i, j, k] = theta
+        if verbose:
+            print(f"x = {x:.0f} mm ({i + 1}/{shape[0]})")
+
+    # Cells the downward tool cannot reach get the nearest reachable cell's solution
+    valid = ~np.isnan(seeds[..., 0])
+    if not valid.any():
+        raise ValueError("No reachable cells in the requested bounds")
+    valid_cells = np.argwhere(valid)
+    empty_cells = np.argwhere(~valid)
+    _, nearest = cKDTree(valid_cells).query(empty_cells)
+    for cell, source in zip(empty_cells, valid_cells[nearest]):
+        seeds[tuple(cell)] = seeds[tuple(source)]
+    if verbose:
+        print(f"{valid.sum()} reachable cells, {len(empty_cells)} filled from nearest neighbour")
+
+    return SeedIndex(seeds.astype(np.float32), bounds[:, 0], spacing)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the on-disk IK seed index")
+    parser.add_argument("--out", default=DEFAULT_PATH, help="output path without extension")
+    parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING, help="grid spacing in mm")
+    args = parser.parse_args()
+
+    index = build_seed_index(spacing=args.spacing, verbose=True)
+    index.save(args.out)
+    print(f"Saved {args.out}.npy ({index.seeds.nbytes / 1e6:.1f} MB)")
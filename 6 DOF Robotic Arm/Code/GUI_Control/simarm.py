@@ -0,0 +1,139 @@
+import os
+import pty
+import time
+import tty
+import random
+import threading
+from frameproto import (FrameDecoder, Frame, ASCII_COMMANDS, OP_MOVE, encode_ack, encode_nack,
+                        decode_move_payload, decode_move_profile, NACK_BAD_OPCODE, NACK_BAD_LENGTH,
+                        MOVE_PAYLOAD_SIZES)
+
+class SimulatedArm:
+    # Stand-in for fullcntl.ino on a local pseudo-terminal, for exercising the
+    # host without hardware. Accepts the ASCII protocol and binary frames on the
+    # same port, prints the firmware's status lines and acknowledges moves ("OK"
+    # in ASCII, ACK/NACK frames in binary). H/S/R block the command loop while
+    # they run (the real firmware only blocks for H and S).
+    #
+    # drop_rate silently ignores that fraction of incoming binary frames and
+    # corrupt_rate NACKs them as if the CRC failed, so the host's retransmit path
+    # can be tested; both use a seeded RNG so runs are repeatable.
+    def __init__(self, homing_time=0.5, shutdown_time=0.5, reset_time=0.5, move_time=0.2, drop_rate=0.0,
+                 corrupt_rate=0.0, seed=0):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port_name = os.ttyname(self.slave)
+        self.homing_time = homing_time
+        self.shutdown_time = shutdown_time
+        self.reset_time = reset_time
+        self.move_time = move_time
+        self.move_timer = None
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.random = random.Random(seed)
+        self.decoder = FrameDecoder()
+        self.joint_angles = [0.0] * 6
+        self.moves = []
+        self.profiles = []  # (speeds, accels) sent with each move, or None
+        self.commands = []
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        os.write(self.master, data)
+
+    def println(self, text):
+        self.write(f"{text}\r\n".encode())
+
+    def run(self):
+        while self.running:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                break
+            if not data:
+                break
+            for event in self.decoder.feed(data):
+                if isinstance(event, Frame):
+                    self.handle_frame(event)
+                elif isinstance(event, tuple):
+                    _, reason, seq = event
+                    self.write(encode_nack(seq, reason))
+                elif event:
+                    self.handle_text(event)
+
+    def handle_frame(self, frame):
+        roll = self.random.random()
+        if roll < self.drop_rate:
+            return
+        if roll < self.drop_rate + self.corrupt_rate:
+            self.write(encode_nack(frame.seq, 1))
+            return
+        if frame.opcode == OP_MOVE:
+            if len(frame.payload) not in MOVE_PAYLOAD_SIZES:
+                self.write(encode_nack(frame.seq, NACK_BAD_LENGTH))
+                return
+            self.write(encode_ack(frame.seq))
+            self.execute("M", decode_move_payload(frame.payload), decode_move_profile(frame.payload))
+        elif frame.opcode in ASCII_COMMANDS:
+            self.write(encode_ack(frame.seq))
+            self.execute(ASCII_COMMANDS[frame.opcode])
+        else:
+            self.write(encode_nack(frame.seq, NACK_BAD_OPCODE))
+
+    def handle_text(self, line):
+        if line.startswith("M"):
+            values = [float(value) for value in line[1:].split(",")]
+            profile = (values[6:12], values[12:18]) if len(values) == 18 else None
+            self.execute("M", values[:6], profile)
+            self.println("OK")
+        else:
+            self.execute(line)
+
+    def execute(self, command, angles=None, profile=None):
+        self.commands.append(command)
+        if command == "M":
+            self.joint_angles = list(angles)
+            self.moves.append(list(angles))
+            self.profiles.append(profile)
+            # A new target retargets the steppers, so only the last move completes
+            if self.move_timer is not None:
+                self.move_timer.cancel()
+            self.move_timer = threading.Timer(self.move_time, self.println, ("Move completed.",))
+            self.move_timer.daemon = True
+            self.move_timer.start()
+        elif command == "H":
+            self.println("Starting homing sequence...")
+            time.sleep(self.homing_time)
+            self.joint_angles = [0.0] * 6
+            self.println("Homing sequence completed.")
+        elif command == "S":
+            self.println("Shutdown sequence initiated...")
+            time.sleep(self.shutdown_time)
+            self.println("Shutdown sequence completed.")
+        elif command == "R":
+            self.println("Resetting all joints to 0...")
+            time.sleep(self.reset_time)
+            self.joint_angles = [0.0] * 6
+            self.println("Reset sequence completed.")
+        elif command == "OPEN":
+            self.println("BLDC motor opened and set to low power mode")
+        elif command == "CLOSE":
+            self.println("BLDC motor closed")
+
+    def close(self):
+        self.running = False
+        if self.move_timer is not None:
+            self.move_timer.cancel()
+        os.close(self.slave)
+        os.close(self.master)
+
+if __name__ == "__main__":
+    arm = SimulatedArm()
+    print(f"Simulated arm on {arm.port_name}. Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        arm.close()
@@ -0,0 +1,102 @@
+import json
+import time
+import numpy as np
+
+STAGE_WINDOW = 300  # newest durations kept per stage for the rolling statistics
+# Histogram bin edges in ms, two per decade from 10 us to 1 s. Bin i counts
+# durations in [edges[i-1], edges[i]); the first and last bins are open-ended.
+HISTOGRAM_EDGES_MS = np.logspace(-2, 3, 11)
+DUMP_INTERVAL = 10.0  # s between lines of the periodic dump
+
+class StageTimer:
+    # Per-stage durations of one frame's processing. start() begins a frame,
+    # lap(stage) charges the time since the previous lap (or the start) to that
+    # stage, and finish() records the frame's total. Each stage keeps its newest
+    # `window` durations in a preallocated ring buffer, so memory stays flat.
+    # Not locked: read stats() on the thread that records (VisionThread emits
+    # snapshots). With a dump_path, finish() appends a stats() line as JSON every
+    # dump_interval seconds.
+    def __init__(self, window=STAGE_WINDOW, dump_path=None, dump_interval=DUMP_INTERVAL):
+        self.window = window
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.buffers = {}  # stage -> durations (s), in the order stages were first seen
+        self.counts = {}  # stage -> durations recorded in total
+        self.frames = 0
+        self.frame_start = None
+        self.last_lap = None
+        self.last_dump = time.monotonic()
+
+    def start(self):
+        self.frame_start = self.last_lap = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.record(stage, now - self.last_lap)
+        self.last_lap = now
+
+    def finish(self):
+        self.record('total', time.perf_counter() - self.frame_start)
+        self.frames += 1
+        if self.dump_path is not None and time.monotonic() - self.last_dump >= self.dump_interval:
+            self.dump()
+
+    def record(self, stage, seconds):
+        buffer = self.buffers.get(stage)
+        if buffer is None:
+            buffer = self.buffers[stage] = np.empty(self.window)
+            self.counts[stage] = 0
+        buffer[self.counts[stage] % self.window] = seconds
+        self.counts[stage] += 1
+
+    def durations(self, stage):
+        # Newest durations (s) of one stage, in no particular order
+        return self.buffers[stage][:min(self.counts[stage], self.window)]
+
+    def reset(self):
+        self.buffers.clear()
+        self.counts.clear()
+        self.frames = 0
+
+    def stage_names(self):
+        # In the order first seen, with the frame total last
+        return sorted(self.buffers, key=lambda stage: stage == 'total')
+
+    def stats(self):
+        stages = {}
+        for stage in self.stage_names():
+            durations_ms = self.durations(stage) * 1000
+            p50, p90, p99 = np.percentile(durations_ms, [50, 90, 99])
+            histogram = np.bincount(np.searchsorted(HISTOGRAM_EDGES_MS, durations_ms, side='right'),
+                                    minlength=len(HISTOGRAM_EDGES_MS) + 1)
+            stages[stage] = {
+                'count': self.counts[stage],
+                'mean_ms': float(durations_ms.mean()),
+                'p50_ms': float(p50),
+                'p90_ms': float(p90),
+                'p99_ms': float(p99),
+                'max_ms': float(durations_ms.max()),
+                'histogram': histogram.tolist(),
+            }
+        return {
+            'frames': self.frames,
+            'window': self.window,
+            'histogram_edges_ms': HISTOGRAM_EDGES_MS.tolist(),
+            'stages': stages,
+        }
+
+    def summary_lines(self):
+        # One short line per stage (mean and p99 over the window), for overlays
+        lines = []
+        for stage in self.stage_names():
+            durations_ms = self.durations(stage) * 1000
+            lines.append(f"{stage:<12s}{durations_ms.mean():6.2f} ms  p99 {np.percentile(durations_ms, 99):6.2f}")
+        return lines
+
+    def dump(self):
+        self.last_dump = time.monotonic()
+        try:
+            with open(self.dump_path, "a") as f:
+                f.write(json.dumps(dict(time=time.time(), **self.stats())) + "\n")
+        except OSError as e:
+            print(f"Could not write stage timings: {e}")
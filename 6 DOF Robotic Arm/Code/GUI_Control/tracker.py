@@ -0,0 +1,126 @@
+import threading
+import numpy as np
+
+MATCH_DISTANCE = 25.0  # mm; a detection further than this from every track starts a new one
+MIN_HITS = 3  # detections before a track is trusted (filters one-frame MOG2 noise)
+MAX_MISSED = 15  # consecutive frames without a detection before a track is dropped
+
+class Track:
+    def __init__(self, track_id, position, pixel, timestamp):
+        self.id = track_id
+        self.position = position  # workspace (Y, X) in mm, as VisionCalibration.to_workspace
+        self.pixel = pixel
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.missed = 0
+        self.claimed = False  # handed out by next_target and not yet finished
+
+    def age(self, now):
+        return now - self.first_seen
+
+class ObjectTracker:
+    # Follows every object in the work area across frames with persistent IDs.
+    # Each update matches detections to tracks greedily, closest pair first, in
+    # workspace mm. Confirmed, unclaimed tracks form the pick queue, oldest first.
+    # Vision updates it from its thread and the GUI takes targets from its own,
+    # so every public method holds the lock. While `paused` (the arm is in the
+    # camera's view), updates are ignored so the gripper doesn't spawn tracks and
+    # occluded objects aren't aged out.
+    def __init__(self, match_distance=MATCH_DISTANCE, min_hits=MIN_HITS, max_missed=MAX_MISSED):
+        self.match_distance = match_distance
+        self.min_hits = min_hits
+        self.max_missed = max_missed
+        self.tracks = {}
+        self.next_id = 1
+        self.paused = False
+        self.lock = threading.Lock()
+
+    def update(self, detections, timestamp):
+        # detections: list of (position_mm, pixel). Returns the track id for each.
+        with self.lock:
+            track_list = list(self.tracks.values())
+            assigned = [None] * len(detections)
+            if self.paused:
+                return assigned
+            if track_list and detections:
+                track_positions = np.array([track.position for track in track_list], dtype=float)
+                detection_positions = np.array([position for position, _ in detections], dtype=float)
+                distances = np.linalg.norm(detection_positions[:, None, :] - track_positions[None, :, :], axis=2)
+                used_tracks = set()
+                for flat_index in np.argsort(distances, axis=None):
+                    d, t = np.unravel_index(flat_index, distances.shape)
+                    if distances[d, t] > self.match_distance:
+                        break
+                    if assigned[d] is not None or t in used_tracks:
+                        continue
+                    track = track_list[t]
+                    track.position, track.pixel = detections[d]
+                    track.last_seen = timestamp
+                    track.hits += 1
+                    track.missed = 0
+                    assigned[d] = track.id
+                    used_tracks.add(t)
+
+            matched_ids = set(assigned)
+            for track in track_list:
+                if track.id not in matched_ids:
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        del self.tracks[track.id]
+
+            for d, (position, pixel) in enumerate(detections):
+                if assigned[d] is None:
+                    track = Track(self.next_id, position, pixel, timestamp)
+                    self.tracks[track.id] = track
+                    self.next_id += 1
+                    assigned[d] = track.id
+            return assigned
+
+    def confirmed(self):
+        with self.lock:
+            return [track for track in self.tracks.values() if track.hits >= self.min_hits]
+
+    def pick_queue(self):
+        # Confirmed tracks not yet handed out, oldest first
+        with self.lock:
+            return self.queued_tracks()
+
+    def next_target(self):
+        # Claims and returns the head of the pick queue, or None
+        with self.lock:
+            queue = self.queued_tracks()
+            if not queue:
+                return None
+            queue[0].claimed = True
+            return queue[0]
+
+    def claim(self, track_id):
+        # Claims a specific queued track (chosen elsewhere, e.g. by a cell
+        # scheduler); None if it is gone or already claimed
+        with self.lock:
+            track = self.tracks.get(track_id)
+            if track is None or track.claimed:
+                return None
+            track.claimed = True
+            return track
+
+    def queued_tracks(self):
+        # Called with the lock held
+        queue = [track for track in self.tracks.values() if track.hits >= self.min_hits and not track.claimed]
+        return sorted(queue, key=lambda track: track.first_seen)
+
+    def release(self, track_id):
+        # The pick didn't happen; put the object back in the queue
+        with self.lock:
+            if track_id in self.tracks:
+                self.tracks[track_id].claimed = False
+
+    def remove(self, track_id):
+        # The object was picked; forget it rather than wait for it to time out
+        with self.lock:
+            self.tracks.pop(track_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.tracks.clear()
@@ -0,0 +1,101 @@
+import math
+import time
+import queue
+import threading
+import numpy as np
+from kinematics import solve_ik
+from armlink import format_move_command
+
+DEFAULT_RESOLUTION = 1.0  # mm between waypoints
+DEFAULT_FEED_RATE = 50.0  # mm/s along the path
+
+def line_waypoints(start, end, resolution=DEFAULT_RESOLUTION):
+    # Evenly spaced points from start (exclusive) to end (inclusive), at most resolution apart
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    steps = max(1, math.ceil(np.linalg.norm(end - start) / resolution))
+    fractions = np.arange(1, steps + 1) / steps
+    return start + fractions[:, None] * (end - start)
+
+def lifted_waypoints(start, end, lift_z, resolution=DEFAULT_RESOLUTION):
+    # Straight up to lift_z, across at that height, then straight down to end
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    above_start = np.array([start[0], start[1], max(lift_z, start[2])])
+    above_end = np.array([end[0], end[1], max(lift_z, end[2])])
+    segments = [line_waypoints(a, b, resolution)
+                for a, b in ((start, above_start), (above_start, above_end), (above_end, end))
+                if np.linalg.norm(b - a) > 0]
+    return np.vstack(segments) if segments else end[None, :]
+
+def solve_waypoints(waypoints, previous_theta, seed_index=None, restricted=True):
+    # Incremental IK: each waypoint is warm-started from, and penalized against,
+    # the solution before it. Yields (target, theta, residual, converged).
+    theta = np.asarray(previous_theta, dtype=float)
+    for target in waypoints:
+        theta, residual, converged = solve_ik(target, theta, seed_index, restricted)
+        yield target, theta, residual, converged
+
+def stream_path(link, waypoints, previous_theta, feed_rate=DEFAULT_FEED_RATE, seed_index=None,
+                restricted=True, cancel_event=None, planner_lead=256):
+    # Plan and stream a Cartesian path. A planner thread solves IK into a bounded
+    # queue so it stays up to planner_lead waypoints ahead of the sender. The
+    # sender releases waypoints at feed_rate (mm/s); SerialLink.send_move holds
+    # it back until the firmware has acknowledged the previous move.
+    # Returns (last joint angles sent, waypoints sent, completed).
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    planner_done = threading.Event()
+    planned = queue.Queue(maxsize=planner_lead)
+
+    def plan():
+        for step in solve_waypoints(waypoints, previous_theta, seed_index, restricted):
+            if cancel_event.is_set() or planner_done.is_set():
+                break
+            planned.put(step)
+            if not step[3]:
+                break
+        planned.put(None)
+
+    planner = threading.Thread(target=plan, daemon=True)
+    planner.start()
+
+    last_theta = np.asarray(previous_theta, dtype=float)
+    last_target = None
+    sent = 0
+    completed = True
+    release_time = time.perf_counter()
+    while True:
+        step = planned.get()
+        if step is None:
+            break
+        target, theta, residual, converged = step
+        if cancel_event.is_set():
+            completed = False
+            break
+        if not converged:
+            print(f"Path stopped: waypoint {np.round(target, 1)} has residual {residual:.2f} mm")
+            completed = False
+            break
+
+        if last_target is not None:
+            release_time += np.linalg.norm(target - last_target) / feed_rate
+            delay = release_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                release_time = time.perf_counter()  # fell behind; don't try to catch up in a burst
+
+        _, joint_angles_deg = format_move_command(theta)
+        link.send_move(joint_angles_deg)
+        last_theta = theta
+        last_target = target
+        sent += 1
+
+    planner_done.set()  # let a blocked planner exit
+    while planner.is_alive():
+        try:
+            planned.get_nowait()
+        except queue.Empty:
+            planner.join(timeout=0.01)
+    return last_theta, sent, completed and sent == len(waypoints)
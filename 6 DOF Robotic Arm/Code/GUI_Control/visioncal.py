@@ -0,0 +1,115 @@
+import os
+import numpy as np
+import cv2
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vision_calibration.npz")
+
+# Workspace (Y, X) in mm of box corners 1-4, the targets of the homography
+REFERENCE_POINTS = np.array([
+    [175, -5],
+    [185, -175],
+    [315, -175],
+    [305, 0]
+], dtype=np.float32)
+
+# Corner detections needed for a fresh calibration, and the history kept after it
+STABILIZATION_FRAMES = 150
+HISTORY_CAPACITY = 300
+
+# A stored calibration is reused when the median of this many live detections
+# lands within CALIBRATION_TOLERANCE pixels of every stored corner
+VALIDATION_FRAMES = 3
+CALIBRATION_TOLERANCE = 5.0
+
+# Padding (px) around the box corners for the cropped processing region, so the
+# box outline (and so corner detection) stays inside the crop
+ROI_MARGIN = 20
+
+class CornerHistory:
+    # Fixed-capacity ring buffer of (6, 2) corner detections. Memory is allocated
+    # once, so it can keep recording for the whole session; statistics cover the
+    # newest `window` observations and cost O(window).
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        self.buffer = np.empty((capacity, 6, 2), dtype=np.float32)
+        self.capacity = capacity
+        self.count = 0  # total observations ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, corners):
+        self.buffer[self.count % self.capacity] = corners
+        self.count += 1
+
+    def clear(self):
+        self.count = 0
+
+    def window(self, size=None):
+        # Newest observations, oldest first
+        size = len(self) if size is None else min(size, len(self))
+        indices = np.arange(self.count - size, self.count) % self.capacity
+        return self.buffer[indices]
+
+    def median(self, size=None):
+        if len(self) == 0:
+            return None
+        return np.median(self.window(size), axis=0)
+
+    def spread(self, size=None):
+        # Per-corner median absolute deviation (px) from the windowed median
+        if len(self) == 0:
+            return None
+        observations = self.window(size)
+        deviation = np.linalg.norm(observations - np.median(observations, axis=0), axis=2)
+        return np.median(deviation, axis=0)
+
+class VisionCalibration:
+    # Stabilized box corners plus everything derived from them: the pixel -> mm
+    # homography, the work-area mask (box corners 1-4) and the processing region
+    # (roi = x, y, w, h) with the mask cropped to it
+    def __init__(self, corners, frame_shape):
+        self.corners = np.asarray(corners, dtype=int)
+        self.frame_shape = tuple(frame_shape[:2])
+        self.homography = cv2.getPerspectiveTransform(self.corners[:4].astype(np.float32), REFERENCE_POINTS)
+        self.box_mask = np.zeros(self.frame_shape, dtype=np.uint8)
+        cv2.fillConvexPoly(self.box_mask, self.corners[:4], 255)
+        self.set_roi()
+
+    def set_roi(self, margin=ROI_MARGIN):
+        height, width = self.frame_shape
+        x0, y0 = np.maximum(self.corners.min(axis=0) - margin, 0)
+        x1, y1 = np.minimum(self.corners.max(axis=0) + margin + 1, [width, height])
+        self.roi = (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+        self.roi_mask = np.ascontiguousarray(self.box_mask[y0:y1, x0:x1])
+
+    def crop(self, image):
+        x, y, w, h = self.roi
+        return image[y:y + h, x:x + w]
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with np.load(path) as data:
+            calibration = cls.__new__(cls)
+            calibration.corners = data['corners']
+            calibration.frame_shape = tuple(data['frame_shape'])
+            calibration.homography = data['homography']
+            calibration.box_mask = data['box_mask']
+        calibration.set_roi()
+        return calibration
+
+    def save(self, path=DEFAULT_PATH):
+        np.savez_compressed(path, corners=self.corners, frame_shape=np.array(self.frame_shape),
+                            homography=self.homography, box_mask=self.box_mask)
+
+    def matches(self, corner_observations, frame_shape, tolerance=CALIBRATION_TOLERANCE):
+        # corner_observations: recent (6, 2) detections from live frames
+        if tuple(frame_shape[:2]) != self.frame_shape or len(corner_observations) == 0:
+            return False
+        observed = np.median(np.asarray(corner_observations, dtype=float), axis=0)
+        return bool(np.max(np.linalg.norm(observed - self.corners, axis=1)) <= tolerance)
+
+    def to_workspace(self, pixel_point):
+        # Pixel (x, y) -> workspace (Y, X) in mm
+        point = np.array([[pixel_point]], dtype=np.float32)
+        transformed_point = cv2.perspectiveTransform(point, self.homography)[0][0]
+        return transformed_point[0], transformed_point[1]
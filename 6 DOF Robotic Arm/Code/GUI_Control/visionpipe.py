@@ -0,0 +1,230 @@
+import time
+import numpy as np
+import cv2
+from visioncal import (VisionCalibration, CornerHistory, DEFAULT_PATH, STABILIZATION_FRAMES,
+                       VALIDATION_FRAMES)
+from tracker import ObjectTracker
+
+class VisionPipeline:
+    # Per-frame vision processing with no Qt or camera: box-corner calibration,
+    # then background subtraction and object tracking inside the work area.
+    # VisionThread drives it from the camera; visionreplay.py from recorded video.
+    # Status text goes to on_debug_info(str) and on_stabilized() fires once the
+    # corners are calibrated. calibration_path=None neither loads nor saves a
+    # stored calibration, which keeps replays independent of the machine's file.
+    def __init__(self, on_debug_info=None, on_stabilized=None, calibration_path=DEFAULT_PATH):
+        self.on_debug_info = on_debug_info if on_debug_info is not None else lambda info: None
+        self.on_stabilized = on_stabilized if on_stabilized is not None else lambda: None
+        self.calibration_path = calibration_path
+        self.corner_history = CornerHistory()
+        self.stable_corners = None
+        self.calibration = None
+        self.roi_processing = True  # after calibration, process only the box's bounding region
+        self.background_subtractor = None
+        self.last_object_position = None
+        self.last_corners = None  # this frame's six corners, or None
+        self.last_detections = []  # this frame's (track id, (Y, X) mm, pixel), largest first
+        self.tracker = ObjectTracker()
+        self.stage_timer = None  # a StageTimer to time each stage; None costs nothing
+        self.timing_overlay = False  # draw the stage timings on debug frames
+        self.reset()
+
+    def reset(self):
+        self.corner_history.clear()
+        self.stable_corners = None
+        self.tracker.clear()
+        self.calibration = self.load_calibration()
+        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=False)
+
+    def process_frame(self, frame, draw_debug=True, timestamp=None):
+        timer = self.stage_timer
+        if timer is None:
+            return self.run_stages(frame, draw_debug, timestamp, None)
+        timer.start()
+        debug_frame, object_position = self.run_stages(frame, draw_debug, timestamp, timer)
+        timer.finish()
+        if self.timing_overlay and debug_frame is not None:
+            self.draw_stage_timings(debug_frame, timer)
+        return debug_frame, object_position
+
+    def run_stages(self, frame, draw_debug, timestamp, timer):
+        # Once calibrated, every stage runs on the calibration's crop; offset maps
+        # crop pixels back to the full frame. Without draw_debug the returned debug
+        # frame is None and no overlay work is done. Every object above the area
+        # threshold feeds the tracker; the largest is returned as before.
+        if self.stable_corners is not None and self.roi_processing:
+            view = self.calibration.crop(frame)
+            offset = np.array(self.calibration.roi[:2])
+        else:
+            view = frame
+            offset = np.zeros(2, dtype=int)
+
+        gray = cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        if timer:
+            timer.lap('grayscale')
+        _, box_mask = cv2.threshold(gray, 30, 255, cv2.THRESH_BINARY_INV)
+        if timer:
+            timer.lap('threshold')
+
+        # Debug: Draw the box_mask on the frame
+        debug_frame = None
+        if draw_debug:
+            mask_overlay = cv2.cvtColor(box_mask, cv2.COLOR_GRAY2BGR)
+            if view is frame:
+                debug_frame = cv2.addWeighted(frame, 0.7, mask_overlay, 0.3, 0)
+            else:
+                debug_frame = frame.copy()
+                self.calibration.crop(debug_frame)[:] = cv2.addWeighted(view, 0.7, mask_overlay, 0.3, 0)
+            if timer:
+                timer.lap('overlay')
+
+        corners = self.find_box_corners(box_mask)
+        self.last_corners = None
+        self.last_detections = []
+        if corners is not None and len(corners) == 6:
+            corners = corners + offset
+            self.last_corners = corners
+            self.corner_history.append(corners)
+            # Debug: Draw detected corners
+            if draw_debug:
+                for corner in corners:
+                    cv2.circle(debug_frame, tuple(corner.astype(int)), 5, (0, 255, 0), -1)
+            self.on_debug_info(f"Corners detected: {len(corners)}")
+        else:
+            self.on_debug_info("No corners detected")
+        if timer:
+            timer.lap('corners')
+
+        if self.stable_corners is None:
+            self.update_calibration(corners, frame.shape)
+            if timer:
+                timer.lap('calibration')
+            return debug_frame, None
+
+        # Debug: Draw stable corners
+        if draw_debug:
+            for corner in self.stable_corners:
+                cv2.circle(debug_frame, tuple(corner.astype(int)), 7, (255, 0, 0), -1)
+
+        work_area_mask = self.calibration.roi_mask if view is not frame else self.calibration.box_mask
+        masked_frame = cv2.bitwise_and(gray, gray, mask=work_area_mask)
+        if timer:
+            timer.lap('mask')
+
+        fg_mask = self.background_subtractor.apply(masked_frame, learningRate=0.0001)
+        if timer:
+            timer.lap('mog2')
+        
+        fg_mask = cv2.erode(fg_mask, None, iterations=2)
+        fg_mask = cv2.dilate(fg_mask, None, iterations=2)
+
+        _, object_mask = cv2.threshold(fg_mask, 244, 255, cv2.THRESH_BINARY)
+        if timer:
+            timer.lap('morphology')
+
+        object_contours, _ = cv2.findContours(object_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_contour_area = 500
+        large_contours = [cnt for cnt in object_contours if cv2.contourArea(cnt) > min_contour_area]
+        large_contours.sort(key=cv2.contourArea, reverse=True)
+        if timer:
+            timer.lap('contours')
+
+        detections = []
+        for contour in large_contours:
+            M = cv2.moments(contour)
+            if M["m00"] != 0:
+                cX = int(M["m10"] / M["m00"]) + int(offset[0])
+                cY = int(M["m01"] / M["m00"]) + int(offset[1])
+                detections.append((contour, self.calibration.to_workspace((cX, cY)), (cX, cY)))
+        if timer:
+            timer.lap('moments')
+
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        track_ids = self.tracker.update([(position, pixel) for _, position, pixel in detections], timestamp)
+        self.last_detections = [(track_id, position, pixel) for (_, position, pixel), track_id in zip(detections, track_ids)]
+        if timer:
+            timer.lap('tracker')
+
+        if draw_debug:
+            for (contour, object_position, (cX, cY)), track_id in zip(detections, track_ids):
+                label = f"X: {object_position[1]:.2f}, Y: {object_position[0]:.2f}"
+                if track_id is not None:
+                    label = f"#{track_id} " + label
+                cv2.drawContours(debug_frame, [contour], 0, (0, 255, 0), 2, offset=tuple(int(v) for v in offset))
+                cv2.circle(debug_frame, (cX, cY), 7, (255, 0, 0), -1)
+                cv2.putText(debug_frame, label, (cX, cY - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+            if timer:
+                timer.lap('draw')
+
+        if detections:
+            object_position = detections[0][1]
+            self.last_object_position = object_position
+            return debug_frame, object_position
+
+        return debug_frame, None
+
+    def draw_stage_timings(self, image, timer):
+        # Rolling mean / p99 per stage in the top-left corner
+        for i, line in enumerate(timer.summary_lines()):
+            cv2.putText(image, line, (10, 20 + 18 * i), cv2.FONT_HERSHEY_PLAIN, 1.1, (0, 255, 255), 1)
+
+    def load_calibration(self):
+        # Saved by a previous session; it still has to pass validation on live frames
+        if self.calibration_path is None:
+            return None
+        try:
+            return VisionCalibration.load(self.calibration_path)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def update_calibration(self, corners, frame_shape):
+        if self.calibration is not None:
+            # Stored calibration: confirm it against a few live detections
+            if len(self.corner_history) < VALIDATION_FRAMES:
+                return
+            if self.calibration.matches(self.corner_history.window(VALIDATION_FRAMES), frame_shape):
+                self.stable_corners = self.calibration.corners
+                self.on_debug_info("Stored calibration confirmed")
+                self.on_stabilized()
+            else:
+                self.calibration = None
+                self.on_debug_info("Stored calibration no longer matches, recalibrating")
+            return
+
+        if len(self.corner_history) >= STABILIZATION_FRAMES:
+            self.stable_corners = self.corner_history.median(STABILIZATION_FRAMES).astype(int)
+            self.calibration = VisionCalibration(self.stable_corners, frame_shape)
+            try:
+                if self.calibration_path is not None:
+                    self.calibration.save(self.calibration_path)
+            except OSError as e:
+                print(f"Could not save vision calibration: {e}")
+            self.on_debug_info("Stable corners established")
+            self.on_stabilized()
+
+    def find_box_corners(self, mask):
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        if contours:
+            largest_contour = max(contours, key=cv2.contourArea)
+
+            epsilon = 0.02 * cv2.arcLength(largest_contour, True)
+            corners = cv2.approxPolyDP(largest_contour, epsilon, True)
+
+            if 6 <= len(corners) <= 8:
+                return self.sort_corners(corners.reshape(-1, 2))
+            else:
+                self.on_debug_info(f"Invalid number of corners: {len(corners)}")
+        else:
+            self.on_debug_info("No contours found")
+
+        return None
+
+    def sort_corners(self, corners):
+        sorted_corners = corners[np.argsort(corners[:, 1])]
+        top_corners = sorted_corners[:3]
+        bottom_corners = sorted_corners[3:]
+        top_corners = top_corners[np.argsort(top_corners[:, 0])]
+        bottom_corners = bottom_corners[np.argsort(bottom_corners[:, 0])]
+        return np.vstack((top_corners, bottom_corners))[:6]
@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+from visionpipe import VisionPipeline
+from stagetimer import StageTimer
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+DEFAULT_FPS = 30.0
+
+def iter_frames(source):
+    # Frames from a video file or a directory of images (sorted by name)
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names:
+            frame = cv2.imread(os.path.join(source, name))
+            if frame is not None:
+                yield frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {source}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+def source_fps(source):
+    if os.path.isdir(source):
+        return DEFAULT_FPS
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else DEFAULT_FPS
+
+def frame_record(index, pipeline, object_position):
+    # Everything the pipeline decided for one frame; no timings, so two runs over
+    # the same input produce identical records
+    calibration = pipeline.calibration if pipeline.stable_corners is not None else None
+    return {
+        'frame': index,
+        'corners': None if pipeline.last_corners is None else np.asarray(pipeline.last_corners).tolist(),
+        'calibrated': calibration is not None,
+        'homography': None if calibration is None else np.round(calibration.homography, 9).tolist(),
+        'objects': [{'id': track_id, 'y_mm': round(float(position[0]), 3), 'x_mm': round(float(position[1]), 3),
+                     'pixel': list(pixel)} for track_id, position, pixel in pipeline.last_detections],
+        'position': None if object_position is None else [round(float(value), 3) for value in object_position],
+    }
+
+def replay(source, roi_processing=True, draw_debug=False, max_frames=None, fps=None, on_record=None,
+           stage_timer=None):
+    # Runs every frame of source through a fresh VisionPipeline (no stored
+    # calibration). Tracker timestamps come from the frame index, not the clock.
+    # Returns the per-frame records and per-frame processing latencies (s).
+    # A stage_timer, if given, is attached to the pipeline for the run.
+    fps = source_fps(source) if fps is None else fps
+    pipeline = VisionPipeline(calibration_path=None)
+    pipeline.roi_processing = roi_processing
+    pipeline.stage_timer = stage_timer
+    records = []
+    latencies = []
+    for index, frame in enumerate(iter_frames(source)):
+        if max_frames is not None and index >= max_frames:
+            break
+        start = time.perf_counter()
+        _, object_position = pipeline.process_frame(frame, draw_debug=draw_debug, timestamp=index / fps)
+        latencies.append(time.perf_counter() - start)
+        record = frame_record(index, pipeline, object_position)
+        records.append(record)
+        if on_record is not None:
+            on_record(record)
+    return records, np.array(latencies)
+
+def benchmark_report(records, latencies):
+    total = float(latencies.sum())
+    calibrated = [record['frame'] for record in records if record['calibrated']]
+    report = {
+        'frames': len(records),
+        'fps': len(records) / total if total > 0 else None,
+        'calibrated_at_frame': calibrated[0] if calibrated else None,
+        'frames_with_objects': sum(1 for record in records if record['objects']),
+    }
+    if len(latencies):
+        p50, p90, p99 = np.percentile(latencies * 1000, [50, 90, 99])
+        report['latency_ms'] = {'mean': float(latencies.mean() * 1000), 'p50': float(p50), 'p90': float(p90),
+                                'p99': float(p99), 'max': float(latencies.max() * 1000)}
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded video through the vision pipeline, headless.")
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--out", help="write per-frame records here as JSON lines")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--fps", type=float, help="frame rate for tracker timestamps (default: from the video)")
+    parser.add_argument("--full-frame", action="store_true", help="disable ROI-cropped processing")
+    parser.add_argument("--draw-debug", action="store_true", help="include overlay drawing in the timings")
+    parser.add_argument("--stage-timing", action="store_true", help="add per-stage timings to the report")
+    parser.add_argument("--timing-dump", help="also append per-stage timings here as JSON lines every 10 s")
+    args = parser.parse_args()
+
+    stage_timer = None
+    if args.stage_timing or args.timing_dump:
+        # Every frame of the run fits in the window
+        stage_timer = StageTimer(window=args.max_frames or 100000, dump_path=args.timing_dump)
+
+    out = open(args.out, "w") if args.out else None
+    write = (lambda record: out.write(json.dumps(record) + "\n")) if out else None
+    try:
+        records, latencies = replay(args.source, roi_processing=not args.full_frame, draw_debug=args.draw_debug,
+                                    max_frames=args.max_frames, fps=args.fps, on_record=write,
+                                    stage_timer=stage_timer)
+    finally:
+        if out:
+            out.close()
+    report = benchmark_report(records, latencies)
+    if stage_timer is not None:
+        report['stages'] = stage_timer.stats()
+        if args.timing_dump:
+            stage_timer.dump()
+    json.dump(report, sys.stdout, indent=2)
+    print()